@@ -1,13 +1,12 @@
+import io
 import streamlit as st
-import pandas as pd
-from data_loader import DataLoader
-from data_validator import DataValidator
-from database import Database
-from card_gallery import CardGallery
+
+# Everything else (pandas, plotly, b2sdk, the Excel engines) is imported by the page that
+# needs it, so the first paint only waits for Streamlit. Python caches the modules, so a
+# page pays for its imports once per process rather than on every rerun.
 
 # Set page configuration for better layout
 st.set_page_config(layout="wide")
-st.write("Page configuration set.")
 
 # Load the CSS in Streamlit
 st.markdown("""
@@ -24,85 +23,149 @@ st.title('Virtual Card Collection Album')
 
 # Sidebar for navigation
 st.sidebar.title("Navigation")
-options = st.sidebar.radio("Go to", ["Upload File", "Card Gallery", "Export Collection"])
+options = st.sidebar.radio("Go to", ["Upload File", "Card Gallery", "Dashboard", "Export Collection"])
 
 # File uploader allowing multiple files
 uploaded_files = st.sidebar.file_uploader("Upload your Excel files", type=["xlsx"], accept_multiple_files=True)
 
-# Initialize classes
-database = Database()
-data_loader = DataLoader()
-data_validator = DataValidator()
-card_gallery = CardGallery()
 
-# Required columns for validation
-required_columns = [
-    'Card Name', 'Set', 'Type', 'Archetype', 'Level', 'Attribute',
-    'Rarity', 'Condition', 'Card Effect', 'ATK', 'DEF',
-    'Spell Category', 'Trap Category', 'Price', 'Inventory Count'
-]
+@st.cache_resource
+def get_database():
+    from database import Database
+    # One connection pool per process, shared by every session
+    return Database()
 
-data_uploaded = False
 
-if uploaded_files:
-    try:
-        # Load and validate data
-        all_data = data_loader.load_and_validate_data(uploaded_files, required_columns)
+@st.cache_resource
+def get_data_loader():
+    from data_loader import DataLoader
+    from deduplicator import CardDeduplicator
+    from upload_cache import UploadCache
+    return DataLoader(cache=UploadCache(), deduplicator=CardDeduplicator())
 
-        if all_data.empty:
-            st.stop()
 
-        # Display the uploaded data for debugging purposes
-        st.write("Uploaded Data")
-        st.write(all_data)
+@st.cache_resource
+def get_card_gallery():
+    from card_gallery import CardGallery
+    from thumbnails import ThumbnailCache
+    return CardGallery(thumbnails=ThumbnailCache())
 
-        # Load data into the database
-        database.load_data_to_db(all_data)
-        data_uploaded = True
 
-        st.success("Data successfully uploaded and stored in the database.")
+if uploaded_files:
+    try:
+        from data_validator import REQUIRED_COLUMNS
+        data_loader = get_data_loader()
+        # Streamlit reruns the script on every interaction; skip uploads already ingested
+        upload_key = data_loader.upload_fingerprint(uploaded_files, REQUIRED_COLUMNS)
+        if st.session_state.get('ingested_upload') != upload_key:
+            # Parse, validate and merge each workbook into the database chunk by chunk
+            counts = data_loader.stream_to_database(uploaded_files, REQUIRED_COLUMNS, get_database())
+
+            if counts['quarantined']:
+                st.warning(f"{counts['quarantined']} rows were quarantined because of validation errors.")
+                st.dataframe(counts['errors'])
+
+            if counts['merged']:
+                st.info(f"{counts['merged']} duplicate rows were merged into {len(counts['merges'])} cards.")
+                st.dataframe(counts['merges'])
+
+            if counts['inserted'] + counts['updated'] + counts['unchanged'] == 0:
+                st.stop()
+
+            st.session_state['ingested_upload'] = upload_key
+
+            st.success(
+                f"Data successfully uploaded and stored in the database: "
+                f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged."
+            )
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
 
-if data_uploaded:
-    # Retrieve data from the database for display
-    all_data = database.retrieve_data_from_db()
-    st.write("Data retrieved from database:")
-    st.write(all_data)
-else:
-    all_data = pd.DataFrame()
-
 # Sidebar for filters
 st.sidebar.header("Filters")
+search_text = st.sidebar.text_input("Search cards", placeholder="Name, effect, archetype or set")
 card_types = st.sidebar.multiselect("Card Type", options=["Monsters", "Spells", "Traps"], default=["Monsters", "Spells", "Traps"])
 price_sort = st.sidebar.radio("Sort by Price", options=["Ascending", "Descending"])
 quantity_sort = st.sidebar.radio("Sort by Quantity", options=["Ascending", "Descending"])
 alphabetical_sort = st.sidebar.radio("Sort Alphabetically", options=["A-Z", "Z-A"])
-
-# Apply filters
-filtered_data = card_gallery.apply_filters(all_data, card_types, price_sort, quantity_sort, alphabetical_sort)
+page_size = st.sidebar.select_slider("Cards per page", options=[12, 30, 60, 120], value=30)
 
 if options == "Card Gallery":
     st.header("Card Gallery")
     st.write("Explore your card collection visually.")
-    if filtered_data.empty:
-        st.write("No cards match the selected filters.")
+    # Only the visible page is fetched and rendered
+    get_card_gallery().display_paged_gallery(
+        get_database(), card_types, price_sort, quantity_sort, alphabetical_sort, page_size=page_size,
+        search=search_text.strip() or None
+    )
+elif options == "Dashboard":
+    st.header("Collection Dashboard")
+    import plotly.express as px
+    database = get_database()
+    # Read from the incrementally maintained summary tables, never the full cards table
+    by_set = database.collection_summary('Set')
+    if by_set.empty:
+        st.write("No cards in the collection yet.")
     else:
-        card_gallery.display_card_gallery(filtered_data)
+        total_value = by_set['Inventory Value'].sum()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Inventory Value", f"${total_value:,.2f}")
+        col2.metric("Cards", f"{by_set['Cards'].sum():,}")
+        col3.metric("Copies", f"{by_set['Copies'].sum():,}")
+
+        st.subheader("Inventory Value by Set")
+        st.plotly_chart(px.bar(by_set.head(25), x='Set', y='Inventory Value'), use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Inventory Value by Rarity")
+            st.plotly_chart(px.bar(database.collection_summary('Rarity'), x='Rarity', y='Inventory Value'),
+                            use_container_width=True)
+        with col2:
+            st.subheader("Inventory Value by Type")
+            st.plotly_chart(px.pie(database.collection_summary('Type'), names='Type', values='Inventory Value'),
+                            use_container_width=True)
+
+        st.subheader("Copies by Condition")
+        st.plotly_chart(px.bar(database.collection_summary('Condition'), x='Condition', y='Copies'),
+                        use_container_width=True)
+
+        st.subheader("Top Value Cards")
+        st.dataframe(database.top_value_cards(10), use_container_width=True)
 elif options == "Export Collection":
     st.header("Export Collection")
     st.write("Export your card collection to an Excel file.")
-
-    if st.button("Export to Excel"):
-        df = database.fetch_data_from_db()
-        export_path = database.export_to_excel(df)
-
-        with open(export_path, 'rb') as file:
-            st.download_button(
-                label="Download Exported Collection",
-                data=file,
-                file_name='exported_collection.xlsx',
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+    import export_collection
+    database = get_database()
+
+    export_mode = st.radio("Export", options=["Full collection", "Changes since last sync"])
+
+    if export_mode == "Full collection" and st.button("Export to Excel"):
+        # Same bulk-listing format as the change export, streamed from the database
+        buffer = io.BytesIO()
+        export_collection.export_to_excel(export_path=buffer, database_path=database.pool.path)
+
+        st.download_button(
+            label="Download Exported Collection",
+            data=buffer.getvalue(),
+            file_name='exported_collection.xlsx',
+            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    elif export_mode == "Changes since last sync" and st.button("Export Changes"):
+        # Only rows added, changed or sold out since the last download, as Add/Revise/Relist/End actions
+        # Built in memory so concurrent sessions never share, or download, each other's file
+        buffer = io.BytesIO()
+        _, change_count, seq = export_collection.export_changes(database, buffer)
+        st.write(f"{change_count} listings changed since the last sync.")
+
+        st.download_button(
+            label="Download Changes",
+            data=buffer.getvalue(),
+            file_name='exported_changes.xlsx',
+            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            # The watermark only moves once the file has actually been downloaded
+            on_click=database.advance_watermark,
+            args=(export_collection.SYNC_CONSUMER, seq)
+        )
 else:
     st.sidebar.write("Please upload Excel files to proceed.")
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""Synthetic card collection workbooks for benchmarking the ingest pipeline.
+
+    python -m benchmarks.generate --rows 100000 --workbooks 4 --output-dir bench_data
+"""
+import argparse
+import os
+from typing import List
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+SETS = [f'Synthetic Set {i} (SYN{i:02d}-EN)' for i in range(60)]
+RARITIES = ['Common', 'Rare', 'Super Rare', 'Ultra Rare', 'Secret Rare', 'Starlight Rare']
+CONDITIONS = ['Mint', 'Near Mint', 'Lightly Played', 'Moderately Played', 'Heavily Played', 'Damaged']
+ATTRIBUTES = ['DARK', 'LIGHT', 'EARTH', 'WATER', 'FIRE', 'WIND', 'DIVINE']
+ARCHETYPES = ['Blue-Eyes', 'Dark Magician', 'Red-Eyes', 'HERO', 'Cyber Dragon', 'Blackwing', 'Sky Striker']
+SPELL_CATEGORIES = ['Normal', 'Quick-Play', 'Continuous', 'Equip', 'Field', 'Ritual']
+TRAP_CATEGORIES = ['Normal', 'Continuous', 'Counter']
+WORDS = ['dragon', 'magician', 'knight', 'storm', 'shadow', 'blade', 'flame', 'spirit', 'guardian', 'beast']
+
+# Share of rows per sheet
+SHEET_SHARES = {'Monsters': 0.6, 'Spells': 0.25, 'Traps': 0.15}
+
+
+def _names(rng, count: int, offset: int) -> np.ndarray:
+    words = rng.choice(WORDS, size=(count, 2))
+    return np.char.add(np.char.add(np.char.capitalize(words[:, 0]), ' '),
+                       np.char.add(np.char.capitalize(words[:, 1]), [f' #{offset + i}' for i in range(count)]))
+
+
+def generate_sheets(rows: int, seed: int = 0, offset: int = 0) -> dict:
+    """Build {sheet name: DataFrame} with about `rows` cards split across Monsters, Spells and Traps."""
+    rng = np.random.default_rng(seed)
+    sheets = {}
+    for sheet, share in SHEET_SHARES.items():
+        count = max(1, int(rows * share))
+        data = {
+            'Card Name': _names(rng, count, offset),
+            'Set': rng.choice(SETS, count),
+            'Rarity': rng.choice(RARITIES, count),
+            'Condition': rng.choice(CONDITIONS, count),
+            'Card Effect': [' '.join(effect) for effect in rng.choice(WORDS, size=(count, 8))],
+            'Price': np.round(rng.gamma(1.5, 4.0, count), 2),
+            'Inventory Count': rng.integers(0, 50, count),
+        }
+        if sheet == 'Monsters':
+            data.update({
+                'Archetype': rng.choice(ARCHETYPES, count),
+                'Level': rng.integers(1, 13, count),
+                'Attribute': rng.choice(ATTRIBUTES, count),
+                'ATK': rng.integers(0, 31, count) * 100,
+                'DEF': rng.integers(0, 31, count) * 100,
+            })
+        elif sheet == 'Spells':
+            data['Spell Category'] = rng.choice(SPELL_CATEGORIES, count)
+        else:
+            data['Trap Category'] = rng.choice(TRAP_CATEGORIES, count)
+        sheets[sheet] = pd.DataFrame(data)
+        offset += count
+    return sheets
+
+
+def write_workbook(path: str, sheets: dict):
+    """Write sheets plus a Summary sheet with xlsxwriter in constant_memory mode."""
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+    for sheet, df in sheets.items():
+        worksheet = workbook.add_worksheet(sheet)
+        worksheet.write_row(0, 0, list(df.columns))
+        for row_number, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_number, 0, row)
+    summary = workbook.add_worksheet('Summary')
+    summary.write_row(0, 0, ['Sheet', 'Rows'])
+    for row_number, (sheet, df) in enumerate(sheets.items(), start=1):
+        summary.write_row(row_number, 0, [sheet, len(df)])
+    workbook.close()
+
+
+def generate_workbooks(rows: int, workbooks: int, output_dir: str, seed: int = 0) -> List[str]:
+    """Write `workbooks` files holding `rows` cards in total; returns their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    per_workbook = max(1, rows // workbooks)
+    for index in range(workbooks):
+        path = os.path.join(output_dir, f'synthetic_{rows}_{index}.xlsx')
+        if not os.path.exists(path):
+            write_workbook(path, generate_sheets(per_workbook, seed=seed + index, offset=index * per_workbook))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--workbooks', type=int, default=1)
+    parser.add_argument('--output-dir', default='bench_data')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for path in generate_workbooks(args.rows, args.workbooks, args.output_dir, args.seed):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Time and memory-track the ingest, query, gallery, search and export hot paths; results are JSON.
+
+    python -m benchmarks.run --rows 1000 10000 100000 --output results.json
+
+Each benchmark is timed over --repeat untraced runs and then run once more under
+tracemalloc for its peak Python allocation. Allocations made in worker processes
+(parallel workbook parsing) are not seen by tracemalloc.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import export_collection
+from card_gallery import CardGallery
+from data_loader import DataLoader
+from data_validator import REQUIRED_COLUMNS
+from database import Database
+from deduplicator import CardDeduplicator
+from benchmarks.generate import generate_workbooks
+
+DEFAULT_ROWS = [1000, 10000]
+
+FILTER_TYPES = ['Monsters', 'Spells']
+
+# Cards per gallery page, the app's default
+PAGE_SIZE = 30
+
+# Two word prefixes, as typed into the gallery search box
+SEARCH_TEXT = 'drag mag'
+
+
+class Context:
+    """Inputs shared by the benchmarks for one collection size."""
+
+    def __init__(self, rows: int, workbooks: int, data_dir: str, work_dir: str, workers: int):
+        self.rows = rows
+        self.work_dir = work_dir
+        self.workers = workers
+        self._databases = itertools.count()
+        self.paths = generate_workbooks(rows, workbooks, data_dir)
+        self.frame = DataLoader(max_workers=workers).load_and_validate_data(self.paths, REQUIRED_COLUMNS)
+        self.database_path = self.fresh_database_path()
+        database = Database(self.database_path)
+        database.load_data_to_db(self.frame)
+        database.close()
+
+    def fresh_database_path(self) -> str:
+        return os.path.join(self.work_dir, f'cards_{next(self._databases)}.db')
+
+
+@contextmanager
+def bench_load_and_validate(ctx: Context):
+    loader = DataLoader(max_workers=ctx.workers)
+    yield lambda: loader.load_and_validate_data(ctx.paths, REQUIRED_COLUMNS)
+
+
+@contextmanager
+def bench_consolidate(ctx: Context):
+    deduplicator = CardDeduplicator()
+    yield lambda: deduplicator.consolidate(ctx.frame)
+
+
+@contextmanager
+def open_database(path: str):
+    database = Database(path)
+    try:
+        yield database
+    finally:
+        database.close()
+
+
+@contextmanager
+def bench_insert(ctx: Context):
+    with open_database(ctx.fresh_database_path()) as database:
+        yield lambda: database.load_data_to_db(ctx.frame)
+
+
+@contextmanager
+def bench_merge_unchanged(ctx: Context):
+    with open_database(ctx.database_path) as database:
+        yield lambda: database.load_data_to_db(ctx.frame)
+
+
+@contextmanager
+def bench_retrieve(ctx: Context):
+    with open_database(ctx.database_path) as database:
+        yield database.retrieve_data_from_db
+
+
+@contextmanager
+def bench_gallery_page(ctx: Context):
+    """One gallery page from the middle of the filtered, sorted collection, as the app loads it."""
+    gallery = CardGallery()
+    with open_database(ctx.database_path) as database:
+        def run():
+            total = database.count_cards(FILTER_TYPES)
+            offset = total // 2 // PAGE_SIZE * PAGE_SIZE
+            return gallery.load_filtered(database, FILTER_TYPES, 'Ascending', 'Descending', 'A-Z',
+                                         limit=PAGE_SIZE, offset=offset)
+        yield run
+
+
+@contextmanager
+def bench_search(ctx: Context):
+    """First page of a ranked prefix search, with the match count the gallery shows."""
+    with open_database(ctx.database_path) as database:
+        def run():
+            database.count_cards(search=SEARCH_TEXT)
+            return database.search(SEARCH_TEXT, limit=PAGE_SIZE)
+        yield run
+
+
+@contextmanager
+def bench_export_to_excel(ctx: Context):
+    export_path = os.path.join(ctx.work_dir, 'export.xlsx')
+    yield lambda: export_collection.export_to_excel(export_path=export_path, database_path=ctx.database_path)
+
+
+# name -> setup(ctx), a context manager yielding the callable to measure; setup and
+# teardown are not timed
+BENCHMARKS = {
+    'load_and_validate_data': bench_load_and_validate,
+    'consolidate': bench_consolidate,
+    'load_data_to_db.insert': bench_insert,
+    'load_data_to_db.unchanged': bench_merge_unchanged,
+    'retrieve_data_from_db': bench_retrieve,
+    'gallery_page': bench_gallery_page,
+    'search': bench_search,
+    'export_to_excel': bench_export_to_excel,
+}
+
+
+def measure(setup, ctx: Context, repeat: int, trace_memory: bool) -> dict:
+    timings = []
+    for _ in range(repeat):
+        with setup(ctx) as run:
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+    result = {'seconds': min(timings), 'seconds_median': float(np.median(timings)), 'repeat': repeat}
+    if trace_memory:
+        with setup(ctx) as run:
+            tracemalloc.start()
+            try:
+                run()
+                result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_benchmarks(rows_list, names, workbooks=1, repeat=1, workers=None, data_dir='bench_data',
+                   trace_memory=True) -> dict:
+    results = []
+    for rows in rows_list:
+        work_dir = tempfile.mkdtemp(prefix='virtualcard-bench-')
+        try:
+            ctx = Context(rows, workbooks, data_dir, work_dir, workers)
+            for name in names:
+                result = measure(BENCHMARKS[name], ctx, repeat, trace_memory)
+                result.update({'benchmark': name, 'rows': rows, 'valid_rows': len(ctx.frame)})
+                print(f"{name:<28} {rows:>9} rows  {result['seconds']:8.3f}s", file=sys.stderr)
+                results.append(result)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {'environment': environment(), 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--workbooks', type=int, default=1, help='split each collection across this many files')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None, help='workbook parsing processes')
+    parser.add_argument('--benchmark', action='append', choices=list(BENCHMARKS),
+                        help='run only these benchmarks (repeatable)')
+    parser.add_argument('--data-dir', default='bench_data', help='where generated workbooks are kept between runs')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.rows, args.benchmark or list(BENCHMARKS), args.workbooks, args.repeat,
+                            args.workers, args.data_dir, not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
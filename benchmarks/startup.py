@@ -0,0 +1,78 @@
+"""Measure cold start of the Streamlit app: time to run app.py once and peak resident memory.
+
+    python -m benchmarks.startup --repeat 5 --output startup.json
+
+Each run is a fresh interpreter executing app.py in Streamlit's bare mode, which renders
+the default page the way a new session does, without a browser. Heavy modules that were
+imported are listed so an accidental eager import shows up in the results.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+from benchmarks.run import environment
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Modules that should only be loaded by the pages that use them
+HEAVY_MODULES = ['pandas', 'numpy', 'plotly', 'b2sdk', 'xlsxwriter', 'openpyxl', 'PIL', 'pyarrow']
+
+# ru_maxrss survives exec and so would include the parent's memory; VmHWM does not
+CHILD = '''
+import json, resource, runpy, sys, time
+start = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="__main__")
+seconds = time.perf_counter() - start
+try:
+    with open("/proc/self/status") as status:
+        peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:")) * 1024
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(json.dumps({
+    "seconds": seconds,
+    "max_rss_bytes": peak,
+    "modules": sorted(name for name in sys.argv[2:] if name in sys.modules),
+}))
+'''
+
+
+def measure_startup(app_path: str = APP_PATH) -> dict:
+    completed = subprocess.run(
+        [sys.executable, '-c', CHILD, app_path, *HEAVY_MODULES],
+        cwd=os.path.dirname(app_path), capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    runs = [measure_startup(args.app) for _ in range(args.repeat)]
+    seconds = [run['seconds'] for run in runs]
+    report = {
+        'environment': environment(),
+        'results': [{
+            'benchmark': 'app_cold_start',
+            'seconds': min(seconds),
+            'seconds_median': float(np.median(seconds)),
+            'max_rss_bytes': max(run['max_rss_bytes'] for run in runs),
+            'heavy_modules': runs[-1]['modules'],
+            'repeat': args.repeat,
+        }],
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,125 @@
 import streamlit as st
 import pandas as pd
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
+import image_uploader
+from thumbnails import ThumbnailCache
+from utils import log_debug, log_span
 
 class CardGallery:
-    B2_KEY_ID = "005b2784557c8a40000000011"
-    B2_APPLICATION_KEY = "K005Z6XVNlsFScgLAeNsdvEz/RiA6x0"
-    B2_BUCKET_ID = "8b82772864c595e78cf80a14"
-    B2_BUCKET_NAME = "playmore"
+    B2_BUCKET_NAME = image_uploader.B2_BUCKET_NAME
 
-    def initialize_b2(self):
-        info = InMemoryAccountInfo()
-        b2_api = B2Api(info)
-        b2_api.authorize_account("production", self.B2_KEY_ID, self.B2_APPLICATION_KEY)
-        return b2_api.get_bucket_by_id(self.B2_BUCKET_ID)
+    PLACEHOLDER_IMAGE_URL = "https://via.placeholder.com/150"
+
+    def __init__(self, thumbnails: ThumbnailCache = None):
+        self.thumbnails = thumbnails or ThumbnailCache()
+
+    def get_bucket(self, refresh=False):
+        return image_uploader.get_b2_bucket(refresh)
 
     def upload_image_to_b2(self, image_data, image_name):
         try:
-            bucket = self.initialize_b2()
-            bucket.upload_bytes(image_data, image_name)
+            try:
+                self.get_bucket().upload_bytes(image_data, image_name)
+            except Exception:
+                # The shared handle may have gone stale; re-authorize once and retry
+                self.get_bucket(refresh=True).upload_bytes(image_data, image_name)
             return f"https://f005.backblazeb2.com/file/{self.B2_BUCKET_NAME}/{image_name}"
         except Exception as e:
             st.error(f"Error uploading image to B2: {e}")
             return None
 
+    def format_card_markdown(self, row):
+        """Render one card's details as a single markdown block."""
+        lines = [
+            f"**{row.get('Card Name', 'Unknown')}**",
+            f"{row.get('Set', 'Unknown Set')}",
+            f"{row.get('Type', 'Unknown Type')}",
+        ]
+
+        if row.get('Type') not in ['Spell', 'Trap', 'Spells', 'Traps']:
+            lines += [
+                f"Level: {row.get('Level', 'N/A')}",
+                f"Attribute: {row.get('Attribute', 'N/A')}",
+                f"ATK: {row.get('ATK', 'N/A')}",
+                f"DEF: {row.get('DEF', 'N/A')}",
+            ]
+
+        lines += [
+            f"Rarity: {row.get('Rarity', 'N/A')}",
+            f"Condition: {row.get('Condition', 'N/A')}",
+            f"Effect: {row.get('Card Effect', 'N/A')}",
+            f"Price: **{self.format_price(row.get('Price', 0.0))}**{self.format_price_movement(row)}",
+            f"Inventory Count: {row.get('Inventory Count', 'N/A')}",
+        ]
+        return '  \n'.join(lines)
+
+    def format_price(self, price):
+        # Prices are held as float32, so print cents rather than the binary approximation
+        return 'N/A' if price is None or pd.isna(price) else f"${price:.2f}"
+
+    def format_price_movement(self, row):
+        """Arrow and change since the card's previous price, or '' when the price never changed."""
+        previous, price = row.get('Previous Price'), row.get('Price')
+        if previous is None or price is None or pd.isna(previous) or pd.isna(price) or previous == price:
+            return ''
+        change = float(price) - float(previous)
+        movement = f" {'▲' if change > 0 else '▼'} ${abs(change):.2f}"
+        if previous:
+            movement += f" ({change / previous:+.1%})"
+        return movement
+
     def display_card_gallery(self, data):
-        st.write("Displaying card gallery")
+        with log_span('render', cards=len(data)):
+            self._render_cards(data)
+
+    def _render_cards(self, data):
         if not data.empty:
+            rows = data.to_dict('records')
+            # Serve local thumbnails; full-size images are only loaded on request
+            thumbnails = self.thumbnails.get_many([row.get('Image URL') for row in rows])
             columns = st.columns(3)  # Create 3 columns for the grid layout
-            for idx, row in data.iterrows():
-                col = columns[idx % 3]
+            for position, row in enumerate(rows):
+                col = columns[position % 3]
                 with col:
                     image_url = row.get('Image URL', '')
                     if not image_url:
-                        st.image("https://via.placeholder.com/150", caption="No Image", use_column_width=True)
+                        st.image(self.PLACEHOLDER_IMAGE_URL, caption="No Image", use_column_width=True)
                     else:
-                        st.image(image_url, use_column_width=True)
-                    st.write(f"**{row.get('Card Name', 'Unknown')}**")
-                    st.write(f"{row.get('Set', 'Unknown Set')}")
-                    st.write(f"{row.get('Type', 'Unknown Type')}")
-
-                    if row.get('Type') not in ['Spell', 'Trap']:
-                        st.write(f"Level: {row.get('Level', 'N/A')}")
-                        st.write(f"Attribute: {row.get('Attribute', 'N/A')}")
-                        st.write(f"ATK: {row.get('ATK', 'N/A')}")
-                        st.write(f"DEF: {row.get('DEF', 'N/A')}")
-
-                    st.write(f"Rarity: {row.get('Rarity', 'N/A')}")
-                    st.write(f"Condition: {row.get('Condition', 'N/A')}")
-                    st.write(f"Effect: {row.get('Card Effect', 'N/A')}")
-                    st.write(f"Price: **${row.get('Price', 0.0)}**")
-                    st.write(f"Inventory Count: {row.get('Inventory Count', 'N/A')}")
+                        st.image(thumbnails.get(image_url) or image_url, use_column_width=True)
+                        if st.checkbox("Show full image", key=f"full_image_{row.get('id', position)}"):
+                            st.image(image_url, use_column_width=True)
+                    st.markdown(self.format_card_markdown(row))
+
+    def display_paged_gallery(self, database, card_types, price_sort, quantity_sort, alphabetical_sort, page_size=30,
+                              search=None):
+        """Render one page of the gallery, fetching only that page from the database.
+
+        With search text the page comes from the full-text index, ranked by relevance.
+        """
+        total = database.count_cards(card_types, search=search)
+        if total == 0:
+            st.write("No cards match the selected filters.")
+            return
+
+        page_count = (total + page_size - 1) // page_size
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        offset = (page - 1) * page_size
+        st.caption(f"Showing cards {offset + 1}-{min(offset + page_size, total)} of {total}")
+
+        page_data = self.load_filtered(
+            database, card_types, price_sort, quantity_sort, alphabetical_sort, limit=page_size, offset=offset,
+            search=search
+        )
+        if not page_data.empty:
+            # Last price change per card on this page, from the maintained price_movement table
+            page_data = page_data.merge(database.price_movement(page_data['id']), on='id', how='left')
+        self.display_card_gallery(page_data)
 
     def apply_filters(self, data, card_types, price_sort, quantity_sort, alphabetical_sort):
-        st.write("Applying filters...")
-        st.write("Selected card types:", card_types)
+        with log_span('filter', rows=len(data)):
+            return self._filter_frame(data, card_types, price_sort, quantity_sort, alphabetical_sort)
+
+    def _filter_frame(self, data, card_types, price_sort, quantity_sort, alphabetical_sort):
+        log_debug("Selected card types: %s", card_types)
 
         required_columns = [
             'Card Name', 'Set', 'Type', 'Level', 'Attribute', 'Rarity', 'Condition', 
@@ -61,7 +127,7 @@ class CardGallery:
         ]
 
         if data.empty or not all(col in data.columns for col in required_columns):
-            st.write("Data is empty or missing required columns.")
+            log_debug("Data is empty or missing required columns.")
             return pd.DataFrame()
 
         if 'Price' not in data.columns:
@@ -77,45 +143,34 @@ class CardGallery:
             data['Market Price'] = 0
 
         filtered_data = data[data['Type'].isin(card_types)]
-        st.write("Filtered data based on card types:")
-        st.write(filtered_data)
-
-        if price_sort == "Ascending":
-            filtered_data = filtered_data.sort_values(by="Price", ascending=True)
-        elif price_sort == "Descending":
-            filtered_data = filtered_data.sort_values(by="Price", ascending=False)
+        log_debug("Filtered data based on card types:")
+        log_debug(filtered_data)
 
-        if quantity_sort == "Ascending":
-            filtered_data = filtered_data.sort_values(by="Inventory Count", ascending=True)
-        elif quantity_sort == "Descending":
-            filtered_data = filtered_data.sort_values(by="Inventory Count", descending=False)
+        order_by = self.sort_order(price_sort, quantity_sort, alphabetical_sort)
+        filtered_data = filtered_data.sort_values(
+            by=[col for col, _ in order_by],
+            ascending=[ascending for _, ascending in order_by]
+        )
 
-        if alphabetical_sort == "A-Z":
-            filtered_data = filtered_data.sort_values(by="Card Name", ascending=True)
-        elif alphabetical_sort == "Z-A":
-            filtered_data = filtered_data.sort_values(by="Card Name", descending=False)
-
-        st.write("Filtered and sorted data:")
-        st.write(filtered_data)
+        log_debug("Filtered and sorted data:")
+        log_debug(filtered_data)
 
         return filtered_data
 
-# Example usage
-data = pd.DataFrame({
-    'Card Name': ['Drakloak', 'Dreepy', 'Munkidori', 'Bug Catching Set', 'Twilight Masquerade Booster Box'],
-    'Set': ['SV06: Twilight Masquerade'] * 5,
-    'Type': ['Common', 'Common', 'Rare', 'Uncommon', 'Booster'],
-    'Level': [3, 1, 2, None, None],
-    'Attribute': ['Dark', 'Dark', 'Psychic', 'None', 'None'],
-    'Rarity': ['Common', 'Common', 'Rare', 'Uncommon', 'Rare'],
-    'Condition': ['New', 'New', 'New', 'New', 'New'],
-    'Card Effect': ['Recon Directive', 'Petty Grudge', 'Athena Brain', 'Draw 2 Cards', 'Contains 10 Packs'],
-    'ATK': [70, 40, 60, None, None],
-    'DEF': [50, 20, 30, None, None],
-    'Price': [0.25, 0.01, 0.17, 0.15, 102.95],
-    'Inventory Count': [335, 475, 316, 264, 87],
-    'Image URL': ['', '', '', '', '']
-})
-
-gallery = CardGallery()
-gallery.display_card_gallery(data)
\ No newline at end of file
+    def sort_order(self, price_sort, quantity_sort, alphabetical_sort):
+        """Build a composite (column, ascending) sort order from the sidebar choices."""
+        return [
+            ('Price', price_sort == "Ascending"),
+            ('Inventory Count', quantity_sort == "Ascending"),
+            ('Card Name', alphabetical_sort == "A-Z"),
+        ]
+
+    def load_filtered(self, database, card_types, price_sort, quantity_sort, alphabetical_sort, limit=None, offset=0,
+                      search=None):
+        """Filter and sort cards in the database with a single indexed query."""
+        if search:
+            with log_span('search', limit=limit, offset=offset):
+                return database.search(search, card_types, limit=limit, offset=offset)
+        order_by = self.sort_order(price_sort, quantity_sort, alphabetical_sort)
+        with log_span('filter', limit=limit, offset=offset):
+            return database.query_cards(card_types, order_by, limit=limit, offset=offset)
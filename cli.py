@@ -0,0 +1,161 @@
+"""Headless batch entry point for scheduled imports and exports; never imports Streamlit.
+
+    python cli.py ingest supplier_drops/ 'archive/2024-*.xlsx' --workers 4
+    python cli.py export --format csv --changes
+    python cli.py reindex
+    python cli.py upload-images scans/
+"""
+import argparse
+import glob
+import os
+import sys
+from typing import List, Tuple
+import export_collection
+from data_loader import CHUNK_SIZE, DataLoader
+from data_validator import REQUIRED_COLUMNS
+from deduplicator import DEFAULT_PRICE_RULE, PRICE_RULES, CardDeduplicator
+from database import DATABASE_PATH, Database
+from thumbnails import ThumbnailCache
+from upload_cache import UploadCache
+from utils import configure_logging
+
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+
+
+def expand_paths(patterns: List[str], extensions: Tuple[str, ...]) -> List[str]:
+    """Resolve files, directories (searched recursively) and glob patterns to matching files, in order."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                for root, _, names in sorted(os.walk(match)):
+                    paths.extend(os.path.join(root, name) for name in sorted(names))
+            else:
+                paths.append(match)
+    # Skip Excel lock files (~$name.xlsx) and anything that is not the right kind of file
+    paths = [
+        path for path in paths
+        if path.lower().endswith(extensions) and not os.path.basename(path).startswith('~$') and os.path.isfile(path)
+    ]
+    return list(dict.fromkeys(paths))
+
+
+def run_ingest(args) -> int:
+    files = expand_paths(args.paths, WORKBOOK_EXTENSIONS)
+    if not files:
+        print("No workbooks found.", file=sys.stderr)
+        return 2
+    cache = None if args.no_cache else UploadCache()
+    deduplicator = None if args.no_dedupe else CardDeduplicator(args.price_rule)
+    loader = DataLoader(max_workers=args.workers, cache=cache, deduplicator=deduplicator)
+    counts = loader.stream_to_database(files, REQUIRED_COLUMNS, Database(args.db), args.chunk_size)
+    print(f"{len(files)} workbooks: {counts['inserted']} inserted, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged, {counts['quarantined']} quarantined, {counts['merged']} merged")
+    if args.errors and not counts['errors'].empty:
+        counts['errors'].to_csv(args.errors, index=False)
+        print(f"Error report written to {args.errors}")
+    if args.merges and not counts['merges'].empty:
+        counts['merges'].to_csv(args.merges, index=False)
+        print(f"Merge report written to {args.merges}")
+    return 1 if args.strict and counts['quarantined'] else 0
+
+
+def run_export(args) -> int:
+    output = args.output or (export_collection.CSV_EXPORT_PATH if args.format == 'csv'
+                             else export_collection.EXPORT_PATH)
+    if args.changes:
+        database = Database(args.db)
+        path, count, seq = export_collection.export_changes(database, output, args.consumer, args.format)
+        # The file is on disk, so it counts as delivered
+        database.advance_watermark(args.consumer, seq)
+        print(f"{count} changed listings written to {path}")
+        return 0
+    if args.format == 'csv':
+        path = export_collection.export_to_csv(export_path=output, database_path=args.db)
+    else:
+        path = export_collection.export_to_excel(export_path=output, database_path=args.db)
+    print(f"Listings written to {path}")
+    return 0
+
+
+def run_reindex(args) -> int:
+    database = Database(args.db)
+    database.rebuild_search_index()
+    database.rebuild_summary()
+    print("Search index and collection summary rebuilt")
+    return 0
+
+
+def run_upload_images(args) -> int:
+    # Only image uploads need the B2 client
+    import image_uploader
+
+    paths = expand_paths(args.paths, IMAGE_EXTENSIONS)
+    if not paths:
+        print("No images found.", file=sys.stderr)
+        return 2
+    if args.local_store:
+        store = image_uploader.LocalObjectStore(args.local_store)
+    else:
+        store = image_uploader.B2ObjectStore(image_uploader.get_b2_bucket(), image_uploader.B2_BUCKET_NAME)
+    uploader = image_uploader.BulkImageUploader(store, max_workers=args.workers, thumbnails=ThumbnailCache())
+    result = uploader.upload_for_cards(image_uploader.images_by_card_name(paths), Database(args.db))
+    print(f"{result['uploaded']} uploaded, {result['skipped']} already stored, {len(result['failed'])} failed, "
+          f"{result['cards_updated']} cards updated")
+    for path, error in result['failed'].items():
+        print(f"  {path}: {error}", file=sys.stderr)
+    return 1 if result['failed'] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=DATABASE_PATH, help='card database (default: %(default)s)')
+    parser.add_argument('--log-level', help='DEBUG, INFO, WARNING, ...')
+    parser.add_argument('--log-json', help='also write log records as JSON lines to this file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='validate workbooks and merge them into the database')
+    ingest.add_argument('paths', nargs='+', help='workbooks, directories or glob patterns')
+    ingest.add_argument('--workers', type=int, help='workbook parsing processes (default: one per CPU)')
+    ingest.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows per database write')
+    ingest.add_argument('--no-cache', action='store_true', help='always re-parse, ignoring the upload cache')
+    ingest.add_argument('--errors', help='write quarantined rows to this CSV file')
+    ingest.add_argument('--price-rule', choices=PRICE_RULES, default=DEFAULT_PRICE_RULE,
+                        help='price kept when duplicate cards are merged (default: %(default)s)')
+    ingest.add_argument('--no-dedupe', action='store_true',
+                        help='skip duplicate consolidation and stream one workbook at a time')
+    ingest.add_argument('--merges', help='write the duplicate merge report to this CSV file')
+    ingest.add_argument('--strict', action='store_true', help='exit with status 1 when any row is quarantined')
+    ingest.set_defaults(run=run_ingest)
+
+    export = commands.add_parser('export', help='write the bulk-listing file')
+    export.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    export.add_argument('--output', help='output path (default depends on the format)')
+    export.add_argument('--changes', action='store_true',
+                        help='only cards changed since the last export, then advance the sync watermark')
+    export.add_argument('--consumer', default=export_collection.SYNC_CONSUMER,
+                        help='sync watermark to use with --changes')
+    export.set_defaults(run=run_export)
+
+    reindex = commands.add_parser('reindex', help='rebuild the search index and collection summary')
+    reindex.set_defaults(run=run_reindex)
+
+    upload = commands.add_parser('upload-images', help='upload card scans and attach them to cards by file name')
+    upload.add_argument('paths', nargs='+', help='images, directories or glob patterns')
+    upload.add_argument('--workers', type=int, default=8, help='concurrent uploads')
+    upload.add_argument('--local-store', help='copy into this directory instead of the B2 bucket')
+    upload.set_defaults(run=run_upload_images)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    configure_logging(level=args.log_level, json_path=args.log_json)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
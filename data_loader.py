@@ -1,78 +1,209 @@
+import functools
+import io
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Iterator, List, Tuple, Union
 import pandas as pd
-import streamlit as st
-from typing import List
-from streamlit.runtime.uploaded_file_manager import UploadedFile
-from utils import log_debug, prepare_data, validate_columns, validate_data_types
+from data_validator import ERROR_COLUMNS, DataValidator
+from deduplicator import MERGE_COLUMNS, CardDeduplicator
+from upload_cache import UploadCache, content_key
+from utils import log_debug, log_span
 
-class DataLoader:
-    def load_and_validate_data(self, files: List[UploadedFile], required_columns: List[str]) -> pd.DataFrame:
-        all_data_list = []
-        log_debug("Loading and validating data...")
+# Sheets to skip (add more sheet names as needed)
+SHEETS_TO_SKIP = ['Summary']
 
-        # Sheets to skip (add more sheet names as needed)
-        sheets_to_skip = ['Summary']
-
-        for file in files:
-            try:
-                # Read the file content as a DataFrame
-                excel_data = pd.ExcelFile(file)
-                for sheet_name in excel_data.sheet_names:
-                    if sheet_name in sheets_to_skip:
-                        log_debug(f"Skipping sheet: {sheet_name}")
-                        continue
-                    df = pd.read_excel(file, sheet_name=sheet_name)
-                    df['Type'] = sheet_name
-                    log_debug(f"Loaded {sheet_name} sheet with {df.shape[0]} rows.")
-                    all_data_list.append(df)
-            except ValueError as e:
-                log_debug(f"Error loading file {file.name}: {e}")
+# Rows written to the database per load_data_to_db call when streaming
+CHUNK_SIZE = 10000
 
-        if not all_data_list:
-            log_debug("No data loaded.")
-            return pd.DataFrame()
+# A workbook path or an uploaded file object (anything with .name and .getvalue())
+WorkbookFile = Union[str, Any]
 
-        all_data = pd.concat(all_data_list, ignore_index=True)
 
-        log_debug(f"Total rows before validation: {all_data.shape[0]}")
-        log_debug(all_data.head())
+def read_workbook(name: str, source: Union[bytes, str]) -> Tuple[str, List[pd.DataFrame]]:
+    """Parse every sheet of one workbook, opening it only once.
 
-        all_data = prepare_data(all_data)
+    Runs in a worker process, so it takes raw bytes or a path rather than an UploadedFile.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    frames = []
+    with pd.ExcelFile(source) as excel_data:
+        for sheet_name in excel_data.sheet_names:
+            if sheet_name in SHEETS_TO_SKIP:
+                continue
+            df = excel_data.parse(sheet_name)
+            df['Type'] = sheet_name
+            frames.append(df)
+    return name, frames
 
-        log_debug(f"Total rows after preparing data: {all_data.shape[0]}")
-        log_debug(all_data.head())
 
-        if not validate_columns(all_data, required_columns):
-            log_debug("Column validation failed.")
-            log_debug(f"Columns found: {', '.join(all_data.columns)}")
-            return pd.DataFrame()
-
-        log_debug(f"Total rows after column validation: {all_data.shape[0]}")
-        log_debug(all_data.head())
+class DataLoader:
+    def __init__(self, max_workers: int = None, cache: UploadCache = None, validator: DataValidator = None,
+                 deduplicator: CardDeduplicator = None):
+        self.max_workers = max_workers
+        self.cache = cache
+        self.validator = validator or DataValidator()
+        # Without a deduplicator, overlapping rows are left to the database merge
+        self.deduplicator = deduplicator
+
+    def _workbook_source(self, file) -> Tuple[str, Union[bytes, str]]:
+        if hasattr(file, 'getvalue'):
+            return file.name, file.getvalue()
+        return str(file), str(file)
+
+    def upload_fingerprint(self, files: List[WorkbookFile], required_columns: List[str]) -> tuple:
+        """Content hashes identifying an upload, used to skip identical reruns."""
+        return tuple(content_key(self._workbook_source(file)[1], required_columns) for file in files)
+
+    def iter_workbooks(self, files: List[WorkbookFile]) -> Iterator[pd.DataFrame]:
+        """Yield the combined sheets of each workbook as soon as it has been parsed."""
+        sources = [self._workbook_source(file) for file in files]
+        for _, frame in self._parse_workbooks(sources):
+            yield frame
+
+    def _parse_workbooks(self, sources) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """Parse (name, source) pairs, yielding (position, frame) as each workbook finishes.
+
+        Workbooks are parsed in parallel across a process pool when there is more than one.
+        """
+        max_workers = min(len(sources), self.max_workers or os.cpu_count() or 1)
+
+        if max_workers <= 1:
+            for position, (name, source) in enumerate(sources):
+                frames = self._read_sheets(name, functools.partial(read_workbook, name, source))
+                frame = self._combine_sheets(name, frames)
+                if frame is not None:
+                    yield position, frame
+            return
+
+        # Only max_workers workbooks are in flight, so parsed sheets that have not been
+        # consumed yet never pile up in memory
+        queued = enumerate(sources)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            in_flight = {}
+
+            def submit(count):
+                for position, (name, source) in itertools.islice(queued, count):
+                    in_flight[pool.submit(read_workbook, name, source)] = (position, name)
+
+            submit(max_workers)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                while done:
+                    future = done.pop()
+                    position, name = in_flight.pop(future)
+                    submit(1)
+                    frames = self._read_sheets(name, future.result)
+                    # The future holds the parsed sheets until it is released
+                    del future
+                    frame = self._combine_sheets(name, frames)
+                    del frames
+                    if frame is not None:
+                        yield position, frame
+
+    def _read_sheets(self, name: str, read) -> List[pd.DataFrame]:
+        """Call read() for a workbook's sheets, logging an unreadable workbook as empty."""
+        try:
+            with log_span('load', file=name):
+                _, frames = read()
+        except ValueError as e:
+            log_debug("Error loading file %s: %s", name, e)
+            return []
+        return frames
+
+    def _combine_sheets(self, name: str, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        if not frames:
+            return None
+        log_debug("Loaded %d sheets from %s", len(frames), name)
+        with log_span('prepare', file=name) as span:
+            workbook_data = pd.concat(frames, ignore_index=True)
+            span['rows'] = len(workbook_data)
+        return workbook_data
+
+    def validate_data(self, all_data: pd.DataFrame, required_columns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Return the valid rows and the error report for quarantined rows."""
+        with log_span('validate', rows=len(all_data)):
+            valid_data, errors = self.validator.validate(all_data, required_columns)
+        if not errors.empty:
+            log_debug("Error report for quarantined rows:")
+            log_debug(errors)
+        return valid_data, errors
+
+    def load_and_validate_data(self, files: List[WorkbookFile], required_columns: List[str]) -> pd.DataFrame:
+        log_debug("Loading and validating data...")
+        all_data_list = list(self.iter_workbooks(files))
 
-        if not validate_data_types(all_data):
-            log_debug("Data type validation failed.")
+        if not all_data_list:
+            log_debug("No data loaded.")
             return pd.DataFrame()
 
-        log_debug(f"Total rows after data type validation: {all_data.shape[0]}")
-        log_debug(all_data.head())
-
-        # Check for rows with missing required columns
-        missing_required = all_data[all_data[required_columns].isnull().any(axis=1)]
-        if not missing_required.empty:
-            log_debug("Rows with missing required columns:")
-            log_debug(missing_required)
-            # Fill missing required columns with placeholders to avoid dropping all rows
-            for col in required_columns:
-                if col in all_data.columns:
-                    all_data[col].fillna('Not specified', inplace=True)
-
-        # Re-check if the required columns exist, then fill NA for them
-        for col in required_columns:
-            if col not in all_data.columns:
-                all_data[col] = 'Not specified'
-            all_data[col].fillna('Not specified', inplace=True)
-
-        log_debug(f"Total rows after handling missing values in required columns: {all_data.shape[0]}")
-        log_debug(all_data.head())
-
-        return all_data
\ No newline at end of file
+        all_data = pd.concat(all_data_list, ignore_index=True)
+        valid_data, _ = self.validate_data(all_data, required_columns)
+        if self.deduplicator:
+            valid_data, _ = self.deduplicator.consolidate(valid_data)
+        return valid_data
+
+    def stream_to_database(self, files: List[WorkbookFile], required_columns: List[str], database,
+                           chunk_size: int = CHUNK_SIZE) -> dict:
+        """Validate each workbook as it is parsed and write it to the database in chunks.
+
+        Workbooks found in the upload cache skip parsing and validation. Without a
+        deduplicator only one workbook is held in memory at a time; with one, the valid
+        rows of the whole upload are consolidated before anything is written. Returns
+        the summed load counts, the number of quarantined rows and their error report,
+        and the number of rows merged away with the merge report.
+        """
+        log_debug("Streaming data into the database...")
+        totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'quarantined': 0, 'merged': 0}
+        error_reports, held = [], {}
+        merges = pd.DataFrame(columns=MERGE_COLUMNS)
+
+        def write(workbook_data):
+            for start in range(0, len(workbook_data), chunk_size):
+                counts = database.load_data_to_db(workbook_data.iloc[start:start + chunk_size])
+                for key, value in counts.items():
+                    totals[key] += value
+
+        def accept(index, name, workbook_data, errors):
+            if not errors.empty:
+                totals['quarantined'] += errors['row'].nunique()
+                error_reports.append(errors.assign(file=name))
+            if self.deduplicator:
+                # Kept by file position so the first spelling of a card does not depend on parse order
+                held[index] = workbook_data
+            else:
+                write(workbook_data)
+
+        pending, pending_keys, pending_indexes = [], [], []
+        for index, file in enumerate(files):
+            name, source = self._workbook_source(file)
+            key = content_key(source, required_columns) if self.cache else None
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                log_debug("Using cached data for %s.", name)
+                accept(index, name, *cached)
+            else:
+                pending.append((name, source))
+                pending_keys.append(key)
+                pending_indexes.append(index)
+
+        for position, workbook_data in self._parse_workbooks(pending):
+            valid_data, errors = self.validate_data(workbook_data, required_columns)
+            if self.cache:
+                self.cache.put(pending_keys[position], valid_data, errors)
+            accept(pending_indexes[position], pending[position][0], valid_data, errors)
+
+        if held:
+            combined = pd.concat([held[index] for index in sorted(held)], ignore_index=True)
+            consolidated, merges = self.deduplicator.consolidate(combined)
+            totals['merged'] = len(combined) - len(consolidated)
+            write(consolidated)
+
+        log_debug("Streamed rows: %s", totals)
+        totals['errors'] = (
+            pd.concat(error_reports, ignore_index=True) if error_reports
+            else pd.DataFrame(columns=ERROR_COLUMNS + ['file'])
+        )
+        totals['merges'] = merges
+        return totals
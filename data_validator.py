@@ -1,21 +1,181 @@
-from typing import List
+from typing import List, Tuple
+import numpy as np
 import pandas as pd
 from utils import log_debug
 
+# Placeholder for missing text values
+MISSING_VALUE = 'Not specified'
+
+# Card types that have no archetype, level, attribute or stats
+NON_MONSTER_TYPES = ['Spells', 'Traps']
+
+# Declarative schema for uploaded card rows.
+#   kind:     'text', 'integer' or 'decimal'
+#   required: a row without a value is quarantined
+#   min:      smallest accepted numeric value
+#   monster:  only meaningful for monsters; blanked for spells and traps
+CARD_SCHEMA = {
+    'Card Name': {'kind': 'text', 'required': True},
+    'Set': {'kind': 'text'},
+    'Type': {'kind': 'text'},
+    'Archetype': {'kind': 'text', 'monster': True},
+    'Level': {'kind': 'integer', 'min': 0, 'monster': True},
+    'Attribute': {'kind': 'text', 'monster': True},
+    'Rarity': {'kind': 'text'},
+    'Condition': {'kind': 'text'},
+    'Card Effect': {'kind': 'text'},
+    'ATK': {'kind': 'integer', 'min': 0, 'monster': True},
+    'DEF': {'kind': 'integer', 'min': 0, 'monster': True},
+    'Spell Category': {'kind': 'text'},
+    'Trap Category': {'kind': 'text'},
+    'Price': {'kind': 'decimal', 'min': 0},
+    'Inventory Count': {'kind': 'integer', 'min': 0},
+}
+
+# Columns every uploaded sheet must provide
+REQUIRED_COLUMNS = list(CARD_SCHEMA)
+
+# Canonical in-memory dtypes for card frames: categoricals for repetitive text,
+# the smallest nullable integers that fit and single-precision prices
+CARD_DTYPES = {
+    'Set': 'category',
+    'Type': 'category',
+    'Archetype': 'category',
+    'Attribute': 'category',
+    'Rarity': 'category',
+    'Condition': 'category',
+    'Spell Category': 'category',
+    'Trap Category': 'category',
+    'Level': 'Int8',
+    'ATK': 'Int16',
+    'DEF': 'Int16',
+    'Inventory Count': 'Int32',
+    'Price': 'float32',
+}
+
+ERROR_COLUMNS = ['row', 'card', 'column', 'value', 'error']
+
+PARSE_ERRORS = {'integer': 'not an integer', 'decimal': 'not a number'}
+
+
+def apply_card_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """Convert the card columns present in data to CARD_DTYPES.
+
+    A column whose stored values do not fit its canonical dtype is left as it is.
+    """
+    conversions = {}
+    for column, dtype in CARD_DTYPES.items():
+        if column not in data.columns or data[column].dtype == dtype:
+            continue
+        values = data[column]
+        if dtype.startswith('Int') or dtype.startswith('float'):
+            values = pd.to_numeric(values, errors='coerce')
+        try:
+            conversions[column] = values.astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            log_debug("Keeping %s as %s; values do not fit %s", column, values.dtype, dtype)
+    return data.assign(**conversions) if conversions else data
+
+
+def widen_floats(data: pd.DataFrame) -> pd.DataFrame:
+    """Turn float32 columns back into float64 holding the shortest matching decimal.
+
+    Used before values leave the process, so a float32 price of 0.1 is stored or
+    exported as 0.1 rather than 0.10000000149011612.
+    """
+    conversions = {
+        column: pd.to_numeric(data[column].astype(str), errors='coerce')
+        for column in data.columns if data[column].dtype == np.float32
+    }
+    return data.assign(**conversions) if conversions else data
+
+
 class DataValidator:
+    def __init__(self, schema: dict = None):
+        self.schema = schema or CARD_SCHEMA
+
     def validate_columns(self, data: pd.DataFrame, required_columns: List[str]) -> bool:
         missing_columns = [col for col in required_columns if col not in data.columns]
         if missing_columns:
-            log_debug(f"Missing required columns: {', '.join(missing_columns)}")
+            log_debug("Missing required columns: %s", ', '.join(missing_columns))
             return False
         return True
 
-    def validate_data_types(self, data: pd.DataFrame) -> bool:
-        for column in ['Price', 'Inventory Count']:
-            if column in data.columns:
-                try:
-                    data[column] = pd.to_numeric(data[column], errors='raise')
-                except ValueError as e:
-                    log_debug(f"Data type error in column '{column}': {e}")
-                    return False
-        return True
\ No newline at end of file
+    def validate(self, data: pd.DataFrame, required_columns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Coerce and check every schema column in one vectorized pass.
+
+        Returns the valid rows with CARD_DTYPES applied and a per-row error report
+        (row, card, column, value, error). Rows with errors are quarantined rather than
+        failing the upload; only missing required columns reject it outright.
+        """
+        if not self.validate_columns(data, required_columns):
+            error = pd.DataFrame([
+                {'row': None, 'card': None, 'column': col, 'value': None, 'error': 'missing column'}
+                for col in required_columns if col not in data.columns
+            ], columns=ERROR_COLUMNS)
+            return pd.DataFrame(), error
+
+        data = data.reset_index(drop=True)
+        card_names = data['Card Name'] if 'Card Name' in data.columns else pd.Series([None] * len(data))
+        bad_rows = np.zeros(len(data), dtype=bool)
+        errors = []
+
+        def report(column, mask, values, message):
+            positions = np.flatnonzero(mask)
+            if len(positions):
+                bad_rows[positions] = True
+                errors.append(pd.DataFrame({
+                    'row': positions, 'card': card_names.iloc[positions].to_numpy(), 'column': column,
+                    'value': values.iloc[positions].astype(str).to_numpy(), 'error': message
+                }))
+
+        non_monster = data['Type'].isin(NON_MONSTER_TYPES).to_numpy() if 'Type' in data.columns else \
+            np.zeros(len(data), dtype=bool)
+        coerced = {}
+
+        for column, rules in self.schema.items():
+            if column not in data.columns:
+                continue
+            values = data[column]
+            if rules['kind'] == 'text':
+                column_values = values.astype('string').str.strip()
+                # A whitespace-only cell is as missing as an empty one
+                column_values = column_values.mask(column_values.eq('').fillna(False).astype(bool))
+                if rules.get('required'):
+                    report(column, column_values.isna().to_numpy(), values, 'missing value')
+                if rules.get('monster'):
+                    column_values = column_values.mask(non_monster, MISSING_VALUE)
+                coerced[column] = column_values.fillna(MISSING_VALUE).astype(object)
+                continue
+
+            numbers = pd.to_numeric(values, errors='coerce')
+            blank = values.isna().to_numpy()
+            if values.dtype == object:
+                blank |= values.astype(str).str.strip().isin(['', MISSING_VALUE]).to_numpy()
+            if rules.get('monster'):
+                blank |= non_monster
+            unparsable = numbers.isna().to_numpy() & ~blank
+            report(column, unparsable, values, PARSE_ERRORS[rules['kind']])
+            if rules.get('required'):
+                report(column, blank, values, 'missing value')
+            if 'min' in rules:
+                report(column, (numbers < rules['min']).to_numpy() & ~blank, values, f"below {rules['min']}")
+            if CARD_DTYPES.get(column, '').startswith('Int'):
+                limit = np.iinfo(CARD_DTYPES[column].lower()).max
+                report(column, (numbers > limit).to_numpy() & ~blank, values, f"above {limit}")
+
+            numbers = numbers.mask(blank)
+            if rules['kind'] == 'integer':
+                fractional = (numbers.notna() & (numbers % 1 != 0)).to_numpy()
+                report(column, fractional, values, 'not a whole number')
+                numbers = numbers.mask(fractional)
+            coerced[column] = numbers
+
+        for column in required_columns:
+            if column not in coerced:
+                coerced[column] = data[column].fillna(MISSING_VALUE)
+
+        valid = apply_card_dtypes(data.assign(**coerced)[~bad_rows].reset_index(drop=True))
+        report_frame = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=ERROR_COLUMNS)
+        log_debug("Validated %d rows: %d valid, %d quarantined.", len(data), len(valid), bad_rows.sum())
+        return valid, report_frame
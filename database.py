@@ -1,45 +1,874 @@
+import json
+import queue
+import re
 import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
 import pandas as pd
+from data_validator import apply_card_dtypes, widen_floats
+from utils import log_debug, log_span
+
+DATABASE_PATH = 'cards.db'
+
+# Connections kept open per process and shared by all sessions
+POOL_SIZE = 4
+
+# Seconds a connection waits on a locked database before failing
+BUSY_TIMEOUT = 30
+
+# Queued write jobs committed together in one transaction by the writer thread
+MAX_WRITE_BATCH = 32
+
+# Applied to every pooled connection when it is opened
+PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA mmap_size=268435456',
+]
+
+# Columns of the typed cards schema, in table order
+CARD_COLUMNS = {
+    'Card Name': 'TEXT NOT NULL',
+    'Set': 'TEXT NOT NULL',
+    'Type': 'TEXT',
+    'Archetype': 'TEXT',
+    'Level': 'INTEGER',
+    'Attribute': 'TEXT',
+    'Rarity': 'TEXT NOT NULL',
+    'Condition': 'TEXT NOT NULL',
+    'Card Effect': 'TEXT',
+    'ATK': 'INTEGER',
+    'DEF': 'INTEGER',
+    'Spell Category': 'TEXT',
+    'Trap Category': 'TEXT',
+    'Price': 'REAL',
+    'Inventory Count': 'INTEGER',
+    'Image URL': 'TEXT',
+}
+
+# Natural identity of a card row; uploads are merged on these columns
+IDENTITY_COLUMNS = ['Card Name', 'Set', 'Rarity', 'Condition']
+
+# Columns the gallery filters and sorts on; each gets a secondary index
+INDEXED_COLUMNS = ['Type', 'Price', 'Inventory Count', 'Card Name']
+
+# Text columns covered by the cards_fts full-text index
+SEARCH_COLUMNS = ['Card Name', 'Card Effect', 'Archetype', 'Set']
+
+# Columns the collection dashboard breaks inventory down by
+SUMMARY_DIMENSIONS = ['Set', 'Rarity', 'Type', 'Condition']
+
+# Julian day number of the Unix epoch; history timestamps are stored as julianday('now')
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+# Placeholder used for missing identity values, matching DataLoader
+MISSING_VALUE = 'Not specified'
+
+# Rows sent to SQLite per executemany call
+BATCH_SIZE = 5000
+
+
+def quote_identifier(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def to_julian_day(value) -> float:
+    """Convert a timestamp (string, datetime or pandas Timestamp, UTC if naive) to a julian day."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_julian_date()
+
+
+def from_julian_days(days: pd.Series) -> pd.Series:
+    return pd.to_datetime(days - UNIX_EPOCH_JULIAN_DAY, unit='D')
+
+
+class ConnectionPool:
+    """A bounded pool of tuned SQLite connections, health-checked on checkout."""
+
+    def __init__(self, path: str = DATABASE_PATH, size: int = POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; any transaction left open is rolled back on return."""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            else:
+                if not self._healthy(conn):
+                    conn.close()
+                    conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class WriteQueue:
+    """Serializes every write in the process through one background thread and connection.
+
+    Jobs queued while a transaction is committing are committed together in the next one,
+    each inside its own savepoint so a failing job is rolled back alone. Readers keep using
+    pooled connections and, with WAL, are not blocked by the writer.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = MAX_WRITE_BATCH):
+        self.pool = pool
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, job, *args) -> Future:
+        """Queue job(conn, *args) to run inside the writer's transaction."""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cards-writer', daemon=True)
+                self._thread.start()
+            self._jobs.put((job, args, future))
+        return future
+
+    def run(self, job, *args):
+        """Queue a job and wait for its result, re-raising its exception."""
+        return self.submit(job, *args).result()
+
+    def _run(self):
+        conn = None
+        try:
+            while True:
+                item = self._jobs.get()
+                if item is None:
+                    return
+                batch = [item]
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._jobs.put(None)
+                        break
+                    batch.append(item)
+                conn = self._commit(conn, batch)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _commit(self, conn, batch) -> sqlite3.Connection:
+        """Run a batch of jobs in one transaction; returns the connection to reuse."""
+        results = []
+        try:
+            if conn is None:
+                conn = self.pool._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            for job, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT job')
+                try:
+                    result = job(conn, *args)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    future.set_exception(e)
+                    continue
+                conn.execute('RELEASE job')
+                results.append((future, result))
+            conn.commit()
+        except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return conn
+        log_debug("Committed %d queued writes.", len(results))
+        for future, result in results:
+            future.set_result(result)
+        return conn
+
+    def close(self):
+        """Finish the queued jobs and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join()
+
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('cards.db')
-        self.c = self.conn.cursor()
-        self.c.execute('''
+    def __init__(self, path: str = DATABASE_PATH, pool: ConnectionPool = None, writer: WriteQueue = None):
+        self.pool = pool or ConnectionPool(path)
+        # All writes go through one queue; reads use the pool directly
+        self.writer = writer or WriteQueue(self.pool)
+        with self.pool.connection() as conn:
+            self._migrate_legacy_table(conn)
+            self._create_schema(conn)
+
+    def _create_schema(self, conn):
+        column_defs = ',\n'.join(f'{quote_identifier(col)} {decl}' for col, decl in CARD_COLUMNS.items())
+        conn.execute(f'''
             CREATE TABLE IF NOT EXISTS cards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {column_defs}
+            )
+        ''')
+        conn.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_cards_identity
+            ON cards ({', '.join(quote_identifier(col) for col in IDENTITY_COLUMNS)})
+        ''')
+        for col in INDEXED_COLUMNS:
+            index_name = 'idx_cards_' + col.lower().replace(' ', '_')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON cards ({quote_identifier(col)})')
+        self._create_change_tracking(conn)
+        self._create_search_index(conn)
+        self._create_summary_tables(conn)
+        self._create_price_history(conn)
+        conn.commit()
+
+    def _summary_delta(self, row: str, sign: str) -> str:
+        """Statements adding (sign '+') or removing (sign '-') one row's totals in card_summary."""
+        copies = f'COALESCE({row}."Inventory Count", 0)'
+        value = f'COALESCE({row}.Price, 0) * {copies}'
+        return '\n'.join(f'''
+                INSERT INTO card_summary (dimension, value, cards, copies, total_value)
+                VALUES ('{dimension}', COALESCE({row}.{quote_identifier(dimension)}, '{MISSING_VALUE}'),
+                        {sign}1, {sign}{copies}, {sign}{value})
+                ON CONFLICT (dimension, value) DO UPDATE SET
+                    cards = cards + excluded.cards,
+                    copies = copies + excluded.copies,
+                    total_value = total_value + excluded.total_value;''' for dimension in SUMMARY_DIMENSIONS)
+
+    def _create_summary_tables(self, conn):
+        """Maintain per-dimension inventory totals incrementally as cards rows change."""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'card_summary'").fetchone()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS card_summary (
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                cards INTEGER NOT NULL,
+                copies INTEGER NOT NULL,
+                total_value REAL NOT NULL,
+                PRIMARY KEY (dimension, value)
+            )
+        ''')
+        # Lets the dashboard read the top holdings straight off an index
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cards_holding_value
+            ON cards (COALESCE(Price, 0) * COALESCE("Inventory Count", 0))
+        ''')
+        tracked = ['Price', 'Inventory Count', *SUMMARY_DIMENSIONS]
+        changed = ' OR '.join(f'old.{quote_identifier(col)} IS NOT new.{quote_identifier(col)}' for col in tracked)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cards_summary_insert AFTER INSERT ON cards BEGIN
+                {self._summary_delta('new', '+')}
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cards_summary_delete AFTER DELETE ON cards BEGIN
+                {self._summary_delta('old', '-')}
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cards_summary_update AFTER UPDATE ON cards WHEN {changed} BEGIN
+                {self._summary_delta('old', '-')}
+                {self._summary_delta('new', '+')}
+            END
+        ''')
+        if not exists:
+            self._rebuild_summary(conn)
+
+    def _rebuild_summary(self, conn):
+        conn.execute('DELETE FROM card_summary')
+        for dimension in SUMMARY_DIMENSIONS:
+            conn.execute(f'''
+                INSERT INTO card_summary (dimension, value, cards, copies, total_value)
+                SELECT '{dimension}', COALESCE({quote_identifier(dimension)}, '{MISSING_VALUE}'), COUNT(*),
+                       SUM(COALESCE("Inventory Count", 0)),
+                       SUM(COALESCE(Price, 0) * COALESCE("Inventory Count", 0))
+                FROM cards GROUP BY 2
+            ''')
+
+    def _create_search_index(self, conn):
+        """Keep an FTS5 index over SEARCH_COLUMNS in sync with cards through triggers."""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'cards_fts'").fetchone()
+        columns = ', '.join(quote_identifier(col) for col in SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{quote_identifier(col)}' for col in SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{quote_identifier(col)}' for col in SEARCH_COLUMNS)
+        changed = ' OR '.join(f'old.{quote_identifier(col)} IS NOT new.{quote_identifier(col)}' for col in SEARCH_COLUMNS)
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+                {columns}, content='cards', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+                INSERT INTO cards_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+                INSERT INTO cards_fts (cards_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE ON cards WHEN {changed} BEGIN
+                INSERT INTO cards_fts (cards_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO cards_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        ''')
+        if not exists:
+            # Index rows that were loaded before the search index existed
+            conn.execute("INSERT INTO cards_fts (cards_fts) VALUES ('rebuild')")
+
+    def rebuild_summary(self):
+        """Recompute card_summary from scratch; normally it is maintained by triggers."""
+        self.writer.run(self._rebuild_summary)
+
+    def rebuild_search_index(self):
+        self.writer.run(lambda conn: conn.execute("INSERT INTO cards_fts (cards_fts) VALUES ('rebuild')"))
+
+    def _create_change_tracking(self, conn):
+        """Log every insert, update and delete on cards so exports can send only the churn.
+
+        synced_listings remembers, per consumer, which cards have been delivered and
+        whether their listing was left active or ended, so the next export can tell an
+        Add from a Relist.
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS card_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                card_id INTEGER NOT NULL,
+                operation TEXT NOT NULL,
+                old_count INTEGER,
+                changed_at REAL NOT NULL DEFAULT (julianday('now'))
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_card_changes_card ON card_changes (card_id, seq)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sync_watermarks (
+                consumer TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS synced_listings (
+                consumer TEXT NOT NULL,
+                card_id INTEGER NOT NULL,
+                listed INTEGER NOT NULL,
+                PRIMARY KEY (consumer, card_id)
+            ) WITHOUT ROWID
+        ''')
+        changed = ' OR '.join(f'old.{quote_identifier(col)} IS NOT new.{quote_identifier(col)}' for col in CARD_COLUMNS)
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS cards_log_insert AFTER INSERT ON cards BEGIN
+                INSERT INTO card_changes (card_id, operation) VALUES (NEW.id, 'insert');
+            END
+        ''')
+        # Recreated so databases made before it had a WHEN clause stop logging no-op updates
+        conn.execute('DROP TRIGGER IF EXISTS cards_log_update')
+        conn.execute(f'''
+            CREATE TRIGGER cards_log_update AFTER UPDATE ON cards WHEN {changed} BEGIN
+                INSERT INTO card_changes (card_id, operation, old_count)
+                VALUES (NEW.id, 'update', OLD."Inventory Count");
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS cards_log_delete AFTER DELETE ON cards BEGIN
+                INSERT INTO card_changes (card_id, operation, old_count)
+                VALUES (OLD.id, 'delete', OLD."Inventory Count");
+            END
+        ''')
+
+    def _create_price_history(self, conn):
+        """Append a price_history row whenever a card's price or inventory count changes.
+
+        price_movement keeps each card's last price change so the gallery can show
+        movement with a primary-key lookup instead of reading the history.
+        """
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'price_history'").fetchone()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_history (
                 id INTEGER PRIMARY KEY,
-                Card_Name TEXT,
-                "Set" TEXT,
-                Type TEXT,
-                Level INTEGER,
-                Attribute TEXT,
-                Rarity TEXT,
-                Condition TEXT,
-                Card_Effect TEXT,
-                ATK INTEGER,
-                DEF INTEGER,
-                Spell_Category TEXT,
-                Trap_Category TEXT,
-                Price REAL,
-                Inventory_Count INTEGER
-            )
-        ''')
-        self.conn.commit()
-
-    def load_data_to_db(self, data: pd.DataFrame):
-        """Load data into the SQLite database."""
-        data.to_sql('cards', self.conn, if_exists='replace', index=False)
+                card_id INTEGER NOT NULL,
+                recorded_at REAL NOT NULL DEFAULT (julianday('now')),
+                price REAL,
+                inventory_count INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_price_history_card ON price_history (card_id, recorded_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_price_history_time ON price_history (recorded_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_movement (
+                card_id INTEGER PRIMARY KEY,
+                previous_price REAL,
+                changed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS cards_history_insert AFTER INSERT ON cards BEGIN
+                INSERT INTO price_history (card_id, price, inventory_count)
+                VALUES (new.id, new.Price, new."Inventory Count");
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS cards_history_update AFTER UPDATE OF Price, "Inventory Count" ON cards
+            WHEN old.Price IS NOT new.Price OR old."Inventory Count" IS NOT new."Inventory Count" BEGIN
+                INSERT INTO price_history (card_id, price, inventory_count)
+                VALUES (new.id, new.Price, new."Inventory Count");
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS cards_movement_update AFTER UPDATE OF Price ON cards
+            WHEN old.Price IS NOT new.Price BEGIN
+                INSERT INTO price_movement (card_id, previous_price, changed_at)
+                VALUES (new.id, old.Price, julianday('now'))
+                ON CONFLICT (card_id) DO UPDATE SET
+                    previous_price = excluded.previous_price,
+                    changed_at = excluded.changed_at;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS cards_movement_delete AFTER DELETE ON cards BEGIN
+                DELETE FROM price_movement WHERE card_id = old.id;
+            END
+        ''')
+        if not exists:
+            # Start the history of cards loaded before it was tracked at their current values
+            conn.execute('''
+                INSERT INTO price_history (card_id, price, inventory_count)
+                SELECT id, Price, "Inventory Count" FROM cards
+            ''')
+
+    def _table_columns(self, conn, table: str) -> list:
+        return [row[1] for row in conn.execute(f'PRAGMA table_info({quote_identifier(table)})')]
+
+    def _migrate_legacy_table(self, conn):
+        """Move a table written by the old full-replace loader into the typed schema."""
+        columns = self._table_columns(conn, 'cards')
+        if not columns or ('id' in columns and 'Card Name' in columns):
+            return
+        conn.execute('ALTER TABLE cards RENAME TO cards_legacy')
+        conn.commit()
+        self._create_schema(conn)
+        legacy = pd.read_sql('SELECT * FROM cards_legacy', conn)
+        if 'Card Name' in legacy.columns:
+            self._merge(conn, legacy.dropna(subset=['Card Name']), 'merge')
+        conn.execute('DROP TABLE cards_legacy')
+        conn.commit()
+
+    def _ensure_columns(self, conn, columns):
+        """Add any upload columns that the cards table does not have yet."""
+        existing = set(self._table_columns(conn, 'cards'))
+        for col in columns:
+            if col not in existing:
+                conn.execute(f'ALTER TABLE cards ADD COLUMN {quote_identifier(col)} TEXT')
+
+    def load_data_to_db(self, data: pd.DataFrame, mode: str = 'merge') -> dict:
+        """Upsert data into the cards table keyed on IDENTITY_COLUMNS.
+
+        With mode='replace' the table is emptied first (keeping its schema).
+        Returns counts of inserted, updated and unchanged rows.
+        """
+        if mode not in ('merge', 'replace'):
+            raise ValueError(f"Unknown load mode: {mode}")
+        return self.writer.run(self._load, data, mode)
+
+    def _load(self, conn, data: pd.DataFrame, mode: str) -> dict:
+        with log_span('persist', rows=len(data)) as span:
+            counts = self._merge(conn, data, mode)
+            span.update(counts)
+            return counts
+
+    def _merge(self, conn, data: pd.DataFrame, mode: str) -> dict:
+        """Upsert data within the caller's transaction."""
+        columns = [col for col in data.columns if col != 'id']
+        missing_identity = [col for col in IDENTITY_COLUMNS if col not in columns]
+        if missing_identity:
+            raise ValueError(f"Missing identity columns: {', '.join(missing_identity)}")
+
+        quoted = [quote_identifier(col) for col in columns]
+        identity = ', '.join(quote_identifier(col) for col in IDENTITY_COLUMNS)
+        join_on = ' AND '.join(f's.{quote_identifier(col)} = c.{quote_identifier(col)}' for col in IDENTITY_COLUMNS)
+        value_cols = [quote_identifier(col) for col in columns if col not in IDENTITY_COLUMNS]
+        differs = ' OR '.join(f'c.{col} IS NOT s.{col}' for col in value_cols) or '0'
+        excluded_differs = ' OR '.join(f'cards.{col} IS NOT excluded.{col}' for col in value_cols) or '0'
+        update_set = ', '.join(f'{col} = excluded.{col}' for col in value_cols)
+
+        cursor = conn.cursor()
+        self._ensure_columns(conn, columns)
+        if mode == 'replace':
+            cursor.execute('DELETE FROM cards')
+
+        # Stage the upload; later rows win when an identity repeats in the upload
+        cursor.execute('DROP TABLE IF EXISTS temp.staging')
+        staging_defs = ', '.join(
+            f"{quote_identifier(col)} {CARD_COLUMNS.get(col, 'TEXT').replace(' NOT NULL', '')}" for col in columns
+        )
+        cursor.execute(f'CREATE TEMP TABLE staging ({staging_defs})')
+        cursor.execute(f'CREATE UNIQUE INDEX temp.idx_staging_identity ON staging ({identity})')
+        insert_staging = (
+            f"INSERT OR REPLACE INTO staging ({', '.join(quoted)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        for start in range(0, len(data), BATCH_SIZE):
+            batch = widen_floats(data.iloc[start:start + BATCH_SIZE][columns]).astype(object)
+            batch = batch.where(batch.notna(), None)
+            batch[IDENTITY_COLUMNS] = batch[IDENTITY_COLUMNS].fillna(MISSING_VALUE)
+            cursor.executemany(insert_staging, batch.itertuples(index=False, name=None))
+
+        staged = cursor.execute('SELECT COUNT(*) FROM staging').fetchone()[0]
+        matched, changed = cursor.execute(f'''
+            SELECT COUNT(*), COALESCE(SUM({differs}), 0)
+            FROM staging s JOIN cards c ON {join_on}
+        ''').fetchone()
+
+        upsert = f"INSERT INTO cards ({', '.join(quoted)}) SELECT {', '.join(quoted)} FROM staging WHERE true "
+        if update_set:
+            upsert += f"ON CONFLICT ({identity}) DO UPDATE SET {update_set} WHERE {excluded_differs}"
+        else:
+            upsert += f"ON CONFLICT ({identity}) DO NOTHING"
+        cursor.execute(upsert)
+        cursor.execute('DROP TABLE temp.staging')
+
+        return {
+            'inserted': staged - matched,
+            'updated': changed,
+            'unchanged': matched - changed,
+        }
+
+    def set_image_urls(self, urls_by_name: dict) -> int:
+        """Set "Image URL" on every row of each named card in one transaction."""
+        return self.writer.run(self._set_image_urls, urls_by_name)
+
+    def _set_image_urls(self, conn, urls_by_name: dict) -> int:
+        cursor = conn.executemany(
+            'UPDATE cards SET "Image URL" = ? WHERE "Card Name" = ?',
+            [(url, name) for name, url in urls_by_name.items()]
+        )
+        return cursor.rowcount
 
     def retrieve_data_from_db(self) -> pd.DataFrame:
         """Retrieve data from the SQLite database."""
-        return pd.read_sql('SELECT * FROM cards', self.conn)
+        with self.pool.connection() as conn:
+            return apply_card_dtypes(pd.read_sql('SELECT * FROM cards', conn))
+
+    def _filters(self, card_types, search=None) -> tuple:
+        """Build the FROM/WHERE clause for a type filter and optional full-text search."""
+        sql, conditions, params = ' FROM cards', [], []
+        if search is not None:
+            sql += ' JOIN cards_fts ON cards_fts.rowid = cards.id'
+            conditions.append('cards_fts MATCH ?')
+            params.append(fts_query(search))
+        if card_types is not None:
+            conditions.append(f"cards.Type IN ({', '.join('?' for _ in card_types)})")
+            params += list(card_types)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return sql, params
+
+    def count_cards(self, card_types=None, search=None) -> int:
+        """Count cards matching the type filter and search text."""
+        if search is not None and not fts_query(search):
+            return 0
+        sql, params = self._filters(card_types, search)
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT COUNT(*)' + sql, params).fetchone()[0]
+
+    def query_cards(self, card_types=None, order_by=(), limit=None, offset=0, search=None) -> pd.DataFrame:
+        """Retrieve cards filtered by type (and search text) and sorted in SQLite.
+
+        order_by is a sequence of (column, ascending) pairs applied in order. Search
+        results without an explicit order come back by relevance.
+        """
+        if search is not None and not fts_query(search):
+            return pd.DataFrame(columns=['id', *CARD_COLUMNS])
+        from_sql, params = self._filters(card_types, search)
+        sql = 'SELECT cards.*' + from_sql
+        if order_by:
+            unknown = [col for col, _ in order_by if col not in CARD_COLUMNS]
+            if unknown:
+                raise ValueError(f"Cannot sort by: {', '.join(unknown)}")
+            sql += ' ORDER BY ' + ', '.join(
+                f"cards.{quote_identifier(col)} {'ASC' if ascending else 'DESC'}" for col, ascending in order_by
+            )
+        elif search is not None:
+            sql += ' ORDER BY cards_fts.rank'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [limit, offset]
+        with self.pool.connection() as conn:
+            return apply_card_dtypes(pd.read_sql(sql, conn, params=params))
+
+    def collection_summary(self, dimension: str) -> pd.DataFrame:
+        """Cards, copies and inventory value per value of a SUMMARY_DIMENSIONS column."""
+        if dimension not in SUMMARY_DIMENSIONS:
+            raise ValueError(f"Unknown summary dimension: {dimension}")
+        with self.pool.connection() as conn:
+            return apply_card_dtypes(pd.read_sql(
+                'SELECT value AS "{0}", cards AS "Cards", copies AS "Copies", '
+                'ROUND(total_value, 2) AS "Inventory Value" FROM card_summary '
+                'WHERE dimension = ? AND cards > 0 ORDER BY total_value DESC'.format(dimension),
+                conn, params=(dimension,)
+            ))
+
+    def top_value_cards(self, limit: int = 10) -> pd.DataFrame:
+        """Cards with the highest holding value (price times inventory count)."""
+        with self.pool.connection() as conn:
+            return apply_card_dtypes(pd.read_sql('''
+                SELECT "Card Name", "Set", Rarity, Condition, Price, "Inventory Count",
+                       COALESCE(Price, 0) * COALESCE("Inventory Count", 0) AS "Holding Value"
+                FROM cards
+                ORDER BY COALESCE(Price, 0) * COALESCE("Inventory Count", 0) DESC
+                LIMIT ?
+            ''', conn, params=(limit,)))
+
+    def price_history(self, card_ids=None, start=None, end=None) -> pd.DataFrame:
+        """Recorded price and inventory changes, oldest first, optionally for some cards and a time range.
+
+        start and end are inclusive and are read as UTC when they carry no timezone.
+        """
+        clauses, params = [], []
+        if card_ids is not None:
+            clauses.append('card_id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps([int(card_id) for card_id in card_ids]))
+        if start is not None:
+            clauses.append('recorded_at >= ?')
+            params.append(to_julian_day(start))
+        if end is not None:
+            clauses.append('recorded_at <= ?')
+            params.append(to_julian_day(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self.pool.connection() as conn:
+            history = pd.read_sql(f'''
+                SELECT card_id AS id, recorded_at AS "Recorded At", price AS "Price",
+                       inventory_count AS "Inventory Count"
+                FROM price_history {where}
+                ORDER BY card_id, recorded_at, price_history.id
+            ''', conn, params=params)
+        history['Recorded At'] = from_julian_days(history['Recorded At'])
+        return apply_card_dtypes(history)
+
+    def price_movement(self, card_ids) -> pd.DataFrame:
+        """Each card's price before its most recent price change and when that change happened."""
+        with self.pool.connection() as conn:
+            movement = pd.read_sql('''
+                SELECT card_id AS id, previous_price AS "Previous Price", changed_at AS "Price Changed At"
+                FROM price_movement WHERE card_id IN (SELECT value FROM json_each(?))
+            ''', conn, params=(json.dumps([int(card_id) for card_id in card_ids]),))
+        movement['Price Changed At'] = from_julian_days(movement['Price Changed At'])
+        return movement
+
+    def price_delta(self, since, card_ids=None) -> pd.DataFrame:
+        """Current price against the price each card had at since, one index seek per card.
+
+        Cards added after since have no earlier price and a null change.
+        """
+        where, params = '', [to_julian_day(since)]
+        if card_ids is not None:
+            where = 'WHERE c.id IN (SELECT value FROM json_each(?))'
+            params.append(json.dumps([int(card_id) for card_id in card_ids]))
+        with self.pool.connection() as conn:
+            delta = pd.read_sql(f'''
+                SELECT c.id, c."Card Name", c."Set", c.Rarity, c.Condition, c.Price, (
+                    SELECT h.price FROM price_history h
+                    WHERE h.card_id = c.id AND h.recorded_at <= ?
+                    ORDER BY h.recorded_at DESC, h.id DESC LIMIT 1
+                ) AS "Price Then"
+                FROM cards c {where}
+                ORDER BY c.id
+            ''', conn, params=params)
+        # Changes are worked out from the stored doubles before Price narrows to float32
+        delta['Price Change'] = delta['Price'] - delta['Price Then']
+        delta['Price Change %'] = delta['Price Change'] / delta['Price Then'].where(delta['Price Then'] != 0)
+        return apply_card_dtypes(delta)
+
+    def search(self, text: str, card_types=None, limit: int = 50, offset: int = 0) -> pd.DataFrame:
+        """Ranked prefix search over card names, effects, archetypes and sets."""
+        return self.query_cards(card_types, limit=limit, offset=offset, search=text)
+
+    def get_watermark(self, consumer: str) -> int:
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT seq FROM sync_watermarks WHERE consumer = ?', (consumer,)).fetchone()
+            return row[0] if row else 0
+
+    def changed_cards(self, consumer: str) -> tuple:
+        """Cards added, changed or removed since the consumer's watermark.
+
+        Returns a frame of the current card rows (id only for deleted cards) with an
+        'Action' column, and the change sequence number to pass to advance_watermark once
+        the changes have been delivered. A card never delivered to the consumer is an Add,
+        a delivered listing is Revised or, once sold out or deleted, Ended, and an ended
+        listing back in stock is a Relist. Cards the consumer never saw listed and that
+        are not in stock are left out.
+
+        A consumer without a watermark has not been sent anything yet, and the log may
+        already be pruned past what it would need, so its first export lists every card
+        in stock as an Add, read in the same snapshot as the latest change sequence.
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT seq FROM sync_watermarks WHERE consumer = ?', (consumer,)).fetchone()
+            if row is None:
+                return self._initial_listings(conn)
+            watermark = row[0]
+            changes = pd.read_sql('''
+                SELECT ch.card_id AS id, ch.last_seq,
+                       c.id IS NULL AS deleted,
+                       s.card_id IS NOT NULL AS delivered,
+                       COALESCE(s.listed, 0) AS listed,
+                       c.*
+                FROM (
+                    SELECT card_id, MAX(seq) AS last_seq
+                    FROM card_changes
+                    WHERE seq > ?
+                    GROUP BY card_id
+                ) ch
+                LEFT JOIN cards c ON c.id = ch.card_id
+                LEFT JOIN synced_listings s ON s.consumer = ? AND s.card_id = ch.card_id
+                ORDER BY ch.card_id
+            ''', conn, params=(watermark, consumer))
+        # Drop the duplicate id from c.* (null for deleted cards)
+        changes = changes.loc[:, ~changes.columns.duplicated()]
+        helper_columns = ['last_seq', 'deleted', 'delivered', 'listed']
+        if changes.empty:
+            return changes.drop(columns=helper_columns).assign(Action=pd.Series(dtype=object)), watermark
+
+        in_stock = pd.to_numeric(changes['Inventory Count'], errors='coerce').fillna(0) > 0
+        in_stock &= ~changes['deleted'].astype(bool)
+        delivered = changes['delivered'].astype(bool)
+        listed = changes['listed'].astype(bool)
+
+        action = pd.Series('Add', index=changes.index, dtype=object)
+        action[in_stock & listed] = 'Revise'
+        action[in_stock & delivered & ~listed] = 'Relist'
+        action[~in_stock & listed] = 'End'
+        # Nothing to send for a card that is not in stock and has no active listing
+        skip = ~in_stock & ~listed
+
+        last_seq = int(changes['last_seq'].max())
+        changes = changes.assign(Action=action)[~skip]
+        changes = changes.drop(columns=helper_columns)
+        return apply_card_dtypes(changes.reset_index(drop=True)), last_seq
+
+    def _initial_listings(self, conn) -> tuple:
+        conn.execute('BEGIN')
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'card_changes'").fetchone()
+            listings = pd.read_sql(
+                'SELECT * FROM cards WHERE COALESCE("Inventory Count", 0) > 0 ORDER BY id', conn
+            )
+        finally:
+            conn.rollback()
+        return apply_card_dtypes(listings.assign(Action='Add')), row[0] if row else 0
+
+    def advance_watermark(self, consumer: str, seq: int):
+        """Record that changes up to seq were delivered and prune log entries no consumer needs."""
+        self.writer.run(self._advance_watermark, consumer, seq)
+
+    def _advance_watermark(self, conn, consumer: str, seq: int):
+        row = conn.execute('SELECT seq FROM sync_watermarks WHERE consumer = ?', (consumer,)).fetchone()
+        watermark = row[0] if row else 0
+        if seq > watermark:
+            self._record_delivered(conn, consumer, watermark, seq, initial=row is None)
+        conn.execute(
+            'INSERT INTO sync_watermarks (consumer, seq) VALUES (?, ?) '
+            'ON CONFLICT (consumer) DO UPDATE SET seq = MAX(seq, excluded.seq)',
+            (consumer, seq)
+        )
+        conn.execute('DELETE FROM card_changes WHERE seq <= (SELECT MIN(seq) FROM sync_watermarks)')
+
+    def _record_delivered(self, conn, consumer: str, watermark: int, seq: int, initial: bool = False):
+        """Update synced_listings for the cards changed in (watermark, seq], or for every
+        card when the consumer's initial export was delivered.
+
+        Whether a card's listing was left active is judged by its inventory as of seq:
+        the old count of its first change after seq if there is one, else its current
+        row. Changes made after the export was written therefore stay pending for the
+        next one.
+        """
+        if initial:
+            # Cards deleted since the export are only left in the log
+            candidates = 'SELECT id AS card_id FROM cards UNION SELECT card_id FROM card_changes WHERE seq > ?3'
+        else:
+            candidates = 'SELECT DISTINCT card_id FROM card_changes WHERE seq > ?2 AND seq <= ?3'
+        # Cards the consumer has no listing for are only recorded once delivered as listed
+        conn.execute(f'''
+            INSERT INTO synced_listings (consumer, card_id, listed)
+            SELECT ?1, card_id, listed FROM (
+                SELECT card_id, COALESCE(CASE
+                    WHEN EXISTS (SELECT 1 FROM card_changes later WHERE later.card_id = ch.card_id AND later.seq > ?3)
+                    THEN (SELECT later.old_count FROM card_changes later
+                          WHERE later.card_id = ch.card_id AND later.seq > ?3
+                          ORDER BY later.seq LIMIT 1)
+                    ELSE (SELECT "Inventory Count" FROM cards WHERE cards.id = ch.card_id)
+                END, 0) > 0 AS listed
+                FROM ({candidates}) ch
+            ) delivered
+            WHERE listed OR EXISTS (
+                SELECT 1 FROM synced_listings s WHERE s.consumer = ?1 AND s.card_id = delivered.card_id
+            )
+            ON CONFLICT (consumer, card_id) DO UPDATE SET listed = excluded.listed
+        ''', (consumer, watermark, seq))
+        # Ended listings of deleted cards can never come back
+        conn.execute('''
+            DELETE FROM synced_listings
+            WHERE consumer = ?1 AND NOT listed
+              AND card_id IN (SELECT card_id FROM card_changes WHERE seq > ?2 AND seq <= ?3)
+              AND NOT EXISTS (SELECT 1 FROM cards WHERE cards.id = synced_listings.card_id)
+        ''', (consumer, watermark, seq))
+
+    def close(self):
+        """Drain pending writes and close every connection."""
+        self.writer.close()
+        self.pool.close()
 
     def export_to_excel(self, data: pd.DataFrame) -> str:
         """Export data to an Excel file."""
         file_path = "exported_collection.xlsx"
-        data.to_excel(file_path, index=False)
+        widen_floats(data).to_excel(file_path, index=False)
         return file_path
 
     def fetch_data_from_db(self) -> pd.DataFrame:
         """Fetch data from the database."""
-        return self.retrieve_data_from_db()
\ No newline at end of file
+        return self.retrieve_data_from_db()
@@ -0,0 +1,150 @@
+import re
+import string
+import unicodedata
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from data_validator import apply_card_dtypes
+from database import IDENTITY_COLUMNS
+from utils import log_debug, log_span
+
+# How the price of a consolidated card is chosen from its duplicates
+#   max, min, first, last: of the duplicates' prices, in upload order for first/last
+#   mean:     plain average
+#   weighted: average weighted by each duplicate's inventory count
+PRICE_RULES = ['max', 'min', 'mean', 'weighted', 'first', 'last']
+
+DEFAULT_PRICE_RULE = 'max'
+
+# Set codes such as LOB-EN, SDK-E, MRD-EN036 or SYN09-EN inside a set name
+SET_CODE_PATTERN = re.compile(r'[(\[]?\b([A-Z0-9]{2,5})-(?:[A-Z]{1,2}\d{0,3}|\d{3})\b[)\]]?')
+
+MERGE_COLUMNS = ['card', 'set', 'rarity', 'condition', 'rows', 'variants', 'inventory', 'price']
+
+APOSTROPHES = re.compile(r"['’`]")
+
+PUNCTUATION = re.compile(r'[^\w\s]|_')
+
+# Fast path for plain ASCII names: apostrophes dropped, other punctuation becomes a space
+ASCII_PUNCTUATION = str.maketrans({**dict.fromkeys(string.punctuation, ' '), "'": None, '`': None})
+
+
+def normalize_name(value: str) -> str:
+    """Case-fold, drop apostrophes, turn other punctuation into spaces and collapse whitespace."""
+    if value.isascii():
+        return ' '.join(value.lower().translate(ASCII_PUNCTUATION).split())
+    value = unicodedata.normalize('NFKC', value).casefold()
+    return ' '.join(PUNCTUATION.sub(' ', APOSTROPHES.sub('', value)).split())
+
+
+def normalize_text(values: pd.Series) -> pd.Series:
+    return pd.Series([normalize_name(value) for value in values.astype(str)], index=values.index, dtype=object)
+
+
+def normalize_sets(values: pd.Series) -> pd.Series:
+    """Reduce set names to their set code where one is given, else to normalized text.
+
+    A set written without its code still matches the coded spelling when both appear
+    in the same upload, e.g. 'Legend of Blue Eyes' and 'Legend of Blue Eyes (LOB-EN)'.
+    """
+    values = values.astype(str)
+    codes = values.str.extract(SET_CODE_PATTERN, expand=False).str.lower()
+    names = normalize_text(values.str.replace(SET_CODE_PATTERN, ' ', regex=True))
+    pairs = pd.DataFrame({'name': names, 'code': codes}).dropna().drop_duplicates()
+    pairs = pairs[pairs['name'] != '']
+    # A name seen with more than one code is ambiguous and left alone
+    code_for_name = pairs.drop_duplicates('name', keep=False).set_index('name')['code']
+    codes = codes.where(codes.notna(), names.map(code_for_name))
+    return codes.where(codes.notna(), names)
+
+
+def _normalized_codes(values: pd.Series, normalize) -> np.ndarray:
+    """Integer codes equal for values that normalize alike, normalizing each distinct value once."""
+    codes, uniques = pd.factorize(values)
+    normalized_codes, _ = pd.factorize(normalize(pd.Series(uniques)))
+    return np.append(normalized_codes, -1)[codes]
+
+
+class CardDeduplicator:
+    def __init__(self, price_rule: str = DEFAULT_PRICE_RULE):
+        if price_rule not in PRICE_RULES:
+            raise ValueError(f"Unknown price rule: {price_rule}")
+        self.price_rule = price_rule
+
+    def group_keys(self, data: pd.DataFrame) -> np.ndarray:
+        """One 64-bit hash per row of its normalized identity columns."""
+        keys = pd.DataFrame({
+            column: _normalized_codes(data[column], normalize_sets if column == 'Set' else normalize_text)
+            for column in IDENTITY_COLUMNS if column in data.columns
+        })
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+    def _prices(self, grouped, duplicates: pd.DataFrame, groups: np.ndarray) -> pd.Series:
+        prices = grouped['Price']
+        if self.price_rule == 'weighted':
+            row_prices = duplicates['Price'].astype('float64')
+            # Rows without a price carry no weight
+            counts = duplicates['Inventory Count'].astype('float64').fillna(0).where(row_prices.notna(), 0)
+            weighted = (row_prices * counts).groupby(groups, sort=False).sum()
+            totals = counts.groupby(groups, sort=False).sum()
+            return (weighted / totals.where(totals > 0)).fillna(prices.mean()).round(2)
+        if self.price_rule == 'mean':
+            return prices.mean().round(2)
+        return getattr(prices, self.price_rule)()
+
+    def consolidate(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Fold rows that are the same card under different spellings into one row.
+
+        Rows are grouped by a hash of their normalized identity, so the cost is linear in
+        the number of rows rather than pairwise. Each group keeps its first row's spelling
+        and first non-empty value per column, sums the inventory counts and takes its
+        price from the price rule. Returns the consolidated rows in upload order and a
+        report with one row per merged group.
+        """
+        if data.empty or 'Card Name' not in data.columns:
+            return data, pd.DataFrame(columns=MERGE_COLUMNS)
+
+        with log_span('dedupe', rows=len(data)) as span:
+            data = data.reset_index(drop=True)
+            group_ids, _ = pd.factorize(self.group_keys(data))
+            duplicated = pd.Series(group_ids).duplicated(keep=False).to_numpy()
+            span['merged'] = int(duplicated.sum() - len(np.unique(group_ids[duplicated])))
+            if not duplicated.any():
+                return data, pd.DataFrame(columns=MERGE_COLUMNS)
+
+            duplicates = data[duplicated]
+            groups = group_ids[duplicated]
+            grouped = duplicates.groupby(groups, sort=False)
+            merged = grouped.first()
+            if 'Inventory Count' in merged.columns:
+                merged['Inventory Count'] = grouped['Inventory Count'].sum(min_count=1)
+            if 'Price' in merged.columns:
+                merged['Price'] = self._prices(grouped, duplicates, groups)
+
+            report = self._report(merged, grouped, duplicates, groups)
+            # Put each merged row where its group first appeared
+            merged.index = pd.Series(np.flatnonzero(duplicated)).groupby(groups, sort=False).first().to_numpy()
+            consolidated = pd.concat([data[~duplicated], merged]).sort_index().reset_index(drop=True)
+
+        log_debug("Consolidated %d rows into %d.", len(data), len(consolidated))
+        return apply_card_dtypes(consolidated), report
+
+    def _report(self, merged: pd.DataFrame, grouped, duplicates: pd.DataFrame, groups: np.ndarray) -> pd.DataFrame:
+        spellings = duplicates['Card Name'].astype(str)
+        if 'Set' in duplicates.columns:
+            spellings = spellings + ' / ' + duplicates['Set'].astype(str)
+        variants = spellings.groupby(groups, sort=False).agg(lambda values: ' | '.join(dict.fromkeys(values)))
+
+        def column(name):
+            return merged[name].to_numpy() if name in merged.columns else None
+
+        return pd.DataFrame({
+            'card': column('Card Name'),
+            'set': column('Set'),
+            'rarity': column('Rarity'),
+            'condition': column('Condition'),
+            'rows': grouped.size().to_numpy(),
+            'variants': variants.to_numpy(),
+            'inventory': column('Inventory Count'),
+            'price': column('Price'),
+        }, columns=MERGE_COLUMNS)
@@ -1,17 +1,30 @@
+import csv
+import os
 import sqlite3
+from functools import lru_cache
 import pandas as pd
+from data_validator import widen_floats
 
 # Define the database and excel file paths
 DATABASE_PATH = 'cards.db'
 EXCEL_TEMPLATE_PATH = '/mnt/data/Final_YuGiOh_Card_Listing_with_Correct_Descriptors_v2.xlsx'
 EXPORT_PATH = 'exported_collection.xlsx'
+CSV_EXPORT_PATH = 'exported_collection.csv'
+
+# Rows fetched from the database cursor at a time
+CHUNK_SIZE = 5000
 
 # Placeholder value for fields that are not directly mapped
 PLACEHOLDER = ''
 
+ACTION_COLUMN = '*Action(SiteID=US|Country=US|Currency=USD|Version=941)'
+
+# Consumer name under which incremental exports store their watermark
+SYNC_CONSUMER = 'ebay'
+
 # Default placeholder values for specific columns
 DEFAULT_VALUES = {
-    '*Action(SiteID=US|Country=US|Currency=USD|Version=941)': 'Add',
+    ACTION_COLUMN: 'Add',
     'CustomLabel': 'YGO-001',
     '*Category': '183454',  # Example category ID for Yu-Gi-Oh!
     'StoreCategory': '',
@@ -73,16 +86,44 @@ DEFAULT_VALUES = {
     'Description': 'This is a limited edition Yu-Gi-Oh! Blue-Eyes White Dragon card from the Legend of Blue Eyes White Dragon set.'
 }
 
+# Column order used when the listing template workbook is not available
+TEMPLATE_COLUMNS = list(DEFAULT_VALUES)
+TEMPLATE_SHEET_NAME = 'Listings'
+
 # Field mapping between database and Excel
 FIELD_MAPPING = {
-    'Card_Name': 'C:Card Name',
+    'Card Name': 'C:Card Name',
     'Set': 'C:Set',
     'Rarity': 'C:Grade',
     'Condition': 'CD:Card Condition - (ID: 40001)',
     'Price': 'Start Price',
-    'Inventory_Count': 'Quantity'
+    'Inventory Count': 'Quantity',
+    'Action': ACTION_COLUMN,
+    'Custom Label': 'CustomLabel'
 }
 
+# Stable per-card label so Revise/End rows match the listing created by Add
+CUSTOM_LABEL_PREFIX = 'VC-'
+
+CARDS_QUERY = f"SELECT *, '{CUSTOM_LABEL_PREFIX}' || id AS \"Custom Label\" FROM cards"
+
+
+@lru_cache(maxsize=4)
+def _read_template_header(path, _modified):
+    # Only the header row is needed; the modification time is only part of the cache key
+    with pd.ExcelFile(path) as xls:
+        sheet_name = xls.sheet_names[0]
+        columns = pd.read_excel(xls, sheet_name=sheet_name, nrows=0).columns
+    return sheet_name, tuple(columns)
+
+
+def load_template(path=EXCEL_TEMPLATE_PATH):
+    """Return the listing sheet name and column order, parsing the template at most once."""
+    if not os.path.exists(path):
+        return TEMPLATE_SHEET_NAME, tuple(TEMPLATE_COLUMNS)
+    return _read_template_header(path, os.path.getmtime(path))
+
+
 def fetch_data_from_db():
     # Connect to the SQLite database
     conn = sqlite3.connect(DATABASE_PATH)
@@ -90,35 +131,135 @@ def fetch_data_from_db():
     conn.close()
     return df
 
-def map_fields(df):
+
+def with_custom_labels(df):
+    if 'id' in df.columns and 'Custom Label' not in df.columns:
+        df = df.assign(**{'Custom Label': CUSTOM_LABEL_PREFIX + df['id'].astype(str)})
+    return df
+
+
+def iter_db_chunks(conn, query=CARDS_QUERY, params=(), chunk_size=CHUNK_SIZE):
+    """Yield (column names, rows) chunks from a cursor without loading the whole table."""
+    cursor = conn.execute(query, params)
+    columns = [description[0] for description in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield columns, rows
+
+
+def iter_frame_chunks(df, chunk_size=CHUNK_SIZE):
+    """Yield (column names, rows) chunks from a DataFrame, with missing values as None."""
+    for start in range(0, len(df), chunk_size):
+        chunk = widen_floats(df.iloc[start:start + chunk_size]).astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield list(chunk.columns), chunk.itertuples(index=False, name=None)
+
+
+def listing_rows(chunks, template_columns):
+    """Turn card row chunks into listing rows in template column order.
+
+    Default values are laid out once; each card row only fills its mapped fields.
+    """
+    base_row = [DEFAULT_VALUES.get(column, PLACEHOLDER) for column in template_columns]
+    positions = {column: index for index, column in enumerate(template_columns)}
+    for columns, rows in chunks:
+        mapped = [
+            (positions[FIELD_MAPPING[column]], index) for index, column in enumerate(columns)
+            if FIELD_MAPPING.get(column) in positions
+        ]
+        for row in rows:
+            listing = base_row.copy()
+            for position, index in mapped:
+                listing[position] = row[index]
+            yield listing
+
+
+def map_fields(df, template_columns=None):
+    if template_columns is None:
+        _, template_columns = load_template()
     # Rename DataFrame columns based on the field mapping
     df = df.rename(columns=FIELD_MAPPING)
 
-    # Add columns that are missing from the DataFrame with default values
-    for column in template_columns:
-        if column not in df.columns:
-            df[column] = DEFAULT_VALUES.get(column, PLACEHOLDER)
+    # Build every template column in one constructor, using defaults for unmapped ones
+    return pd.DataFrame({
+        column: df[column] if column in df.columns else DEFAULT_VALUES.get(column, PLACEHOLDER)
+        for column in template_columns
+    }, index=df.index)
 
-    # Ensure the DataFrame columns are in the same order as the template
-    df = df[template_columns]
 
-    return df
+def _card_chunks(df, database_path):
+    if df is not None:
+        yield from iter_frame_chunks(with_custom_labels(df))
+        return
+    conn = sqlite3.connect(database_path)
+    try:
+        yield from iter_db_chunks(conn)
+    finally:
+        conn.close()
+
+
+def write_listings_xlsx(rows, export_path, sheet_name, template_columns):
+    """Write listing rows with xlsxwriter in constant_memory mode, flushing row by row.
+
+    export_path may also be a binary file object such as io.BytesIO.
+
+    Empty cells are skipped and values are written with their typed writer to avoid
+    xlsxwriter's per-cell type sniffing.
+    """
+    # The Excel engine is only loaded when a workbook is actually written
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(export_path, {'constant_memory': True, 'strings_to_urls': False})
+    worksheet = workbook.add_worksheet(sheet_name[:31])
+    worksheet.write_row(0, 0, template_columns)
+    write_string, write_number = worksheet.write_string, worksheet.write_number
+    for row_number, row in enumerate(rows, start=1):
+        for column_number, value in enumerate(row):
+            if value is None or value == '':
+                continue
+            if isinstance(value, (int, float)):
+                write_number(row_number, column_number, value)
+            else:
+                write_string(row_number, column_number, str(value))
+    workbook.close()
+    return export_path
+
+
+def write_listings_csv(rows, export_path, template_columns):
+    """Write listing rows as an eBay File Exchange CSV."""
+    with open(export_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(template_columns)
+        writer.writerows(rows)
+    return export_path
+
+
+def export_to_excel(df=None, export_path=EXPORT_PATH, database_path=DATABASE_PATH):
+    """Export cards (a DataFrame, or the cards table streamed in chunks) as a bulk-listing workbook."""
+    sheet_name, template_columns = load_template()
+    rows = listing_rows(_card_chunks(df, database_path), template_columns)
+    return write_listings_xlsx(rows, export_path, sheet_name, template_columns)
 
-def export_to_excel(df):
-    # Load the Excel template to get the correct column order
-    with pd.ExcelFile(EXCEL_TEMPLATE_PATH) as xls:
-        sheet_name = xls.sheet_names[0]
-        template_df = pd.read_excel(xls, sheet_name=sheet_name)
 
-    # Get the columns from the template
-    global template_columns
-    template_columns = template_df.columns
+def export_to_csv(df=None, export_path=CSV_EXPORT_PATH, database_path=DATABASE_PATH):
+    """Export cards as a File Exchange CSV, streaming from the database when no DataFrame is given."""
+    _, template_columns = load_template()
+    rows = listing_rows(_card_chunks(df, database_path), template_columns)
+    return write_listings_csv(rows, export_path, template_columns)
 
-    # Ensure the DataFrame has all necessary columns in the correct order
-    df = map_fields(df)
 
-    # Export the mapped DataFrame to a new Excel file
-    with pd.ExcelWriter(EXPORT_PATH, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
+def export_changes(database, export_path=EXPORT_PATH, consumer=SYNC_CONSUMER, file_format='xlsx'):
+    """Export only the cards added, changed or sold out since the consumer's last sync.
 
-    return EXPORT_PATH
\ No newline at end of file
+    Returns the export path, the number of listing rows and the change sequence to pass
+    to database.advance_watermark once the file has been delivered.
+    """
+    changes, seq = database.changed_cards(consumer)
+    sheet_name, template_columns = load_template()
+    rows = listing_rows(iter_frame_chunks(with_custom_labels(changes)), template_columns)
+    if file_format == 'csv':
+        write_listings_csv(rows, export_path, template_columns)
+    else:
+        write_listings_xlsx(rows, export_path, sheet_name, template_columns)
+    return export_path, len(changes), seq
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+from utils import log_debug
+
+# Uploads in flight at once
+MAX_WORKERS = 8
+
+# Attempts per file before it is reported as failed
+MAX_ATTEMPTS = 4
+
+# Seconds before the first retry; doubled on each further attempt
+BACKOFF_SECONDS = 0.5
+
+B2_KEY_ID = "005b2784557c8a40000000011"
+B2_APPLICATION_KEY = "K005Z6XVNlsFScgLAeNsdvEz/RiA6x0"
+B2_BUCKET_ID = "8b82772864c595e78cf80a14"
+B2_BUCKET_NAME = "playmore"
+
+# Authorized bucket handle shared by every session in the process
+_bucket = None
+_b2_lock = threading.Lock()
+
+# Folder inside the bucket holding content-addressed card images
+OBJECT_PREFIX = 'cards/'
+
+
+def file_sha256(path: str) -> str:
+    """Hash a file in blocks so large scans are never read into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def object_name_for(path: str) -> str:
+    """Name an image by its content hash so identical scans map to one object."""
+    return OBJECT_PREFIX + file_sha256(path) + os.path.splitext(path)[1].lower()
+
+
+def initialize_b2():
+    # b2sdk is only imported once a bucket is actually needed
+    from b2sdk.v2 import InMemoryAccountInfo, B2Api
+    info = InMemoryAccountInfo()
+    b2_api = B2Api(info)
+    b2_api.authorize_account("production", B2_KEY_ID, B2_APPLICATION_KEY)
+    return b2_api.get_bucket_by_id(B2_BUCKET_ID)
+
+
+def get_b2_bucket(refresh: bool = False):
+    """Return the shared bucket, authorizing only on first use or when refresh is requested."""
+    global _bucket
+    with _b2_lock:
+        if _bucket is None or refresh:
+            _bucket = initialize_b2()
+        return _bucket
+
+
+class B2ObjectStore:
+    """Adapter exposing the object-store calls the uploader needs on top of a b2sdk bucket."""
+
+    def __init__(self, bucket, bucket_name: str):
+        self.bucket = bucket
+        self.bucket_name = bucket_name
+
+    def exists(self, name: str) -> bool:
+        from b2sdk.v2.exception import FileNotPresent
+        try:
+            self.bucket.get_file_info_by_name(name)
+            return True
+        except FileNotPresent:
+            return False
+
+    def upload_file(self, path: str, name: str):
+        # upload_local_file streams from disk rather than loading the file
+        self.bucket.upload_local_file(local_file=path, file_name=name)
+
+    def url_for(self, name: str) -> str:
+        return f"https://f005.backblazeb2.com/file/{self.bucket_name}/{name}"
+
+
+class LocalObjectStore:
+    """Directory-backed stand-in for the bucket, for tests and offline runs."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split('/'))
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def upload_file(self, path: str, name: str):
+        target = self._path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+
+    def url_for(self, name: str) -> str:
+        return 'file://' + os.path.abspath(self._path(name))
+
+
+class BulkImageUploader:
+    def __init__(self, store, max_workers: int = MAX_WORKERS, max_attempts: int = MAX_ATTEMPTS,
+                 backoff: float = BACKOFF_SECONDS, thumbnails=None):
+        self.store = store
+        self.thumbnails = thumbnails
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def _with_retries(self, action, *args):
+        for attempt in range(self.max_attempts):
+            try:
+                return action(*args)
+            except Exception as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                log_debug("Retrying after error (%s) in %.1fs", e, delay)
+                time.sleep(delay)
+
+    def _upload_one(self, path: str) -> tuple:
+        name = object_name_for(path)
+        url = self.store.url_for(name)
+        if self.thumbnails is not None:
+            # Build the gallery thumbnail while the file is local; the gallery can
+            # still fetch it later, so a failure here must not fail the upload
+            try:
+                self.thumbnails.put_file(url, path)
+            except Exception as e:
+                log_debug("Could not build thumbnail for %s: %s", path, e)
+        if self._with_retries(self.store.exists, name):
+            return url, True
+        self._with_retries(self.store.upload_file, path, name)
+        return url, False
+
+    def upload_files(self, paths: List[str]) -> dict:
+        """Upload image files concurrently, skipping content already in the store.
+
+        Returns the URL per path along with uploaded/skipped counts and per-path failures.
+        """
+        result = {'urls': {}, 'uploaded': 0, 'skipped': 0, 'failed': {}}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._upload_one, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    url, skipped = future.result()
+                except Exception as e:
+                    result['failed'][path] = str(e)
+                    continue
+                result['urls'][path] = url
+                result['skipped' if skipped else 'uploaded'] += 1
+        log_debug("Uploaded %d, skipped %d, failed %d images.",
+                  result['uploaded'], result['skipped'], len(result['failed']))
+        return result
+
+    def upload_for_cards(self, images: Dict[str, str], database) -> dict:
+        """Upload {card name: image path} and write the URLs to the matching cards rows."""
+        result = self.upload_files(list(images.values()))
+        urls_by_name = {
+            card_name: result['urls'][path] for card_name, path in images.items() if path in result['urls']
+        }
+        result['cards_updated'] = database.set_image_urls(urls_by_name)
+        return result
+
+
+def images_by_card_name(paths: List[str]) -> Dict[str, str]:
+    """Match image files to cards by file name, e.g. 'Dark Magician.png' -> 'Dark Magician'."""
+    return {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
@@ -0,0 +1,133 @@
+import io
+import pandas as pd
+import pytest
+import export_collection
+from database import Database
+
+CONSUMER = 'ebay'
+
+
+def cards(*rows) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'Card Name': name, 'Set': 'LOB', 'Rarity': 'Common', 'Condition': 'Near Mint',
+         'Price': 1.5, 'Inventory Count': count}
+        for name, count in rows
+    ])
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'cards.db'))
+    yield database
+    database.close()
+
+
+def sync(database, consumer=CONSUMER) -> dict:
+    """Export the pending changes, mark them delivered and return {card name or id: action}."""
+    changes, seq = database.changed_cards(consumer)
+    database.advance_watermark(consumer, seq)
+    return {row['Card Name'] if isinstance(row['Card Name'], str) else row['id']: row['Action']
+            for _, row in changes.iterrows()}
+
+
+def delete_card(database, name):
+    database.writer.run(lambda conn: conn.execute('DELETE FROM cards WHERE "Card Name" = ?', (name,)))
+
+
+def test_new_cards_are_added_then_revised(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    assert sync(database) == {'Dark Magician': 'Add'}
+    database.load_data_to_db(cards(('Dark Magician', 3)))
+    assert sync(database) == {'Dark Magician': 'Revise'}
+
+
+def test_sold_out_listing_is_ended_then_relisted(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    sync(database)
+    database.load_data_to_db(cards(('Dark Magician', 0)))
+    assert sync(database) == {'Dark Magician': 'End'}
+    database.load_data_to_db(cards(('Dark Magician', 1)))
+    assert sync(database) == {'Dark Magician': 'Relist'}
+
+
+def test_card_never_listed_is_added_when_restocked(database):
+    database.load_data_to_db(cards(('Dark Magician', 0)))
+    assert sync(database) == {}
+    database.load_data_to_db(cards(('Dark Magician', 4)))
+    assert sync(database) == {'Dark Magician': 'Add'}
+
+
+def test_sold_out_and_restocked_between_exports_is_revised(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    sync(database)
+    database.load_data_to_db(cards(('Dark Magician', 0)))
+    database.load_data_to_db(cards(('Dark Magician', 5)))
+    assert sync(database) == {'Dark Magician': 'Revise'}
+
+
+def test_only_delivered_listings_are_ended_on_delete(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    sync(database)
+    database.load_data_to_db(cards(('Blue-Eyes White Dragon', 1)))
+    delete_card(database, 'Dark Magician')
+    delete_card(database, 'Blue-Eyes White Dragon')
+    assert sync(database) == {1: 'End'}
+    with database.pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM synced_listings').fetchone()[0] == 0
+
+
+def test_changes_after_the_export_stay_pending(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    changes, seq = database.changed_cards(CONSUMER)
+    database.load_data_to_db(cards(('Dark Magician', 0)))
+    database.advance_watermark(CONSUMER, seq)
+    assert list(changes['Action']) == ['Add']
+    assert sync(database) == {'Dark Magician': 'End'}
+
+
+def test_consumers_track_their_own_listings(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    sync(database, 'ebay')
+    database.load_data_to_db(cards(('Dark Magician', 0)))
+    sync(database, 'ebay')
+    database.load_data_to_db(cards(('Dark Magician', 1)))
+    assert sync(database, 'ebay') == {'Dark Magician': 'Relist'}
+    assert sync(database, 'tcgplayer') == {'Dark Magician': 'Add'}
+
+
+def test_first_export_after_the_log_was_pruned_lists_the_catalog(database):
+    database.load_data_to_db(cards(('Dark Magician', 2), ('Blue-Eyes White Dragon', 1), ('Kuriboh', 0)))
+    sync(database, 'ebay')
+    database.load_data_to_db(cards(('Dark Magician', 3)))
+    sync(database, 'ebay')
+    with database.pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM card_changes').fetchone()[0] == 0
+
+    expected = {'Dark Magician': 'Add', 'Blue-Eyes White Dragon': 'Add'}
+    assert sync(database, 'tcgplayer') == expected
+    assert sync(database, 'shopify') == expected
+    database.load_data_to_db(cards(('Dark Magician', 0), ('Kuriboh', 1)))
+    assert sync(database, 'shopify') == {'Dark Magician': 'End', 'Kuriboh': 'Add'}
+
+
+def test_unchanged_writes_are_not_logged(database):
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    database.set_image_urls({'Dark Magician': 'https://example.com/dm.png'})
+    sync(database)
+    database.set_image_urls({'Dark Magician': 'https://example.com/dm.png'})
+    database.load_data_to_db(cards(('Dark Magician', 2)))
+    assert sync(database) == {}
+    database.set_image_urls({'Dark Magician': 'https://example.com/dm-v2.png'})
+    assert sync(database) == {'Dark Magician': 'Revise'}
+
+
+def test_changes_export_to_a_buffer(database):
+    database.load_data_to_db(cards(('Dark Magician', 2), ('Kuriboh', 0)))
+    buffer = io.BytesIO()
+    _, count, seq = export_collection.export_changes(database, buffer)
+    listings = pd.read_excel(io.BytesIO(buffer.getvalue()))
+    assert count == len(listings) == 1
+    assert listings[export_collection.ACTION_COLUMN].tolist() == ['Add']
+    assert database.get_watermark(CONSUMER) == 0
+    database.advance_watermark(CONSUMER, seq)
+    assert database.get_watermark(CONSUMER) == seq
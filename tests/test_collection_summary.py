@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+from database import Database
+
+
+def cards(*rows) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'Card Name': name, 'Set': card_set, 'Type': card_type, 'Rarity': 'Common', 'Condition': 'Near Mint',
+         'Price': price, 'Inventory Count': count}
+        for name, card_set, card_type, price, count in rows
+    ])
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'cards.db'))
+    yield database
+    database.close()
+
+
+def execute(database, sql, *params):
+    database.writer.run(lambda conn: conn.execute(sql, params))
+
+
+def summary(database) -> list:
+    with database.pool.connection() as conn:
+        return conn.execute('''
+            SELECT dimension, value, cards, copies, ROUND(total_value, 6) FROM card_summary
+            WHERE cards != 0 ORDER BY dimension, value
+        ''').fetchall()
+
+
+def assert_matches_rebuild(database):
+    maintained = summary(database)
+    database.rebuild_summary()
+    assert maintained == summary(database)
+
+
+def test_triggers_match_a_rebuild(database):
+    database.load_data_to_db(cards(
+        ('Dark Magician', 'LOB', 'Monsters', 12.5, 2),
+        ('Pot of Greed', 'LOB', 'Spells', 3.0, 4),
+        ('Mirror Force', 'MRD', 'Traps', None, 1),
+        ('Kuriboh', 'MRD', None, 0.25, None),
+    ))
+    assert_matches_rebuild(database)
+
+    # Price, inventory and the Type dimension change in place
+    database.load_data_to_db(cards(
+        ('Dark Magician', 'LOB', 'Monsters', 15.0, 1),
+        ('Kuriboh', 'MRD', 'Monsters', 0.25, 3),
+    ))
+    assert_matches_rebuild(database)
+
+    execute(database, 'UPDATE cards SET "Set" = ? WHERE "Card Name" = ?', 'SDY', 'Mirror Force')
+    database.set_image_urls({'Pot of Greed': 'https://example.com/pot.png'})
+    assert_matches_rebuild(database)
+
+    execute(database, 'DELETE FROM cards WHERE "Card Name" = ?', 'Pot of Greed')
+    assert_matches_rebuild(database)
+
+    database.load_data_to_db(cards(('Sangan', 'MRD', 'Monsters', 1.0, 2)), mode='replace')
+    assert_matches_rebuild(database)
+    assert database.collection_summary('Set').values.tolist() == [['MRD', 1, 2, 2.0]]
+
+
+def test_summary_reads_dashboard_totals(database):
+    database.load_data_to_db(cards(
+        ('Dark Magician', 'LOB', 'Monsters', 12.5, 2),
+        ('Pot of Greed', 'LOB', 'Spells', 3.0, 4),
+        ('Kuriboh', 'MRD', None, 0.25, 1),
+    ))
+    by_type = database.collection_summary('Type').set_index('Type')
+    assert by_type.loc['Monsters', 'Inventory Value'] == 25.0
+    assert by_type.loc['Not specified', 'Copies'] == 1
+    assert database.top_value_cards(1)['Card Name'].tolist() == ['Dark Magician']
+    with pytest.raises(ValueError):
+        database.collection_summary('Price')
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from data_validator import ERROR_COLUMNS, MISSING_VALUE, REQUIRED_COLUMNS, DataValidator
+
+
+def upload(*rows) -> pd.DataFrame:
+    """Rows of a sheet with every required column, as openpyxl hands them over."""
+    base = {
+        'Card Name': 'Dark Magician', 'Set': 'LOB', 'Type': 'Monsters', 'Archetype': 'Dark Magician',
+        'Level': 7, 'Attribute': 'DARK', 'Rarity': 'Ultra Rare', 'Condition': 'Near Mint',
+        'Card Effect': '', 'ATK': 2500, 'DEF': 2100, 'Spell Category': None, 'Trap Category': None,
+        'Price': 12.5, 'Inventory Count': 2,
+    }
+    return pd.DataFrame([{**base, **row} for row in rows], columns=REQUIRED_COLUMNS)
+
+
+def validate(data):
+    return DataValidator().validate(data, REQUIRED_COLUMNS)
+
+
+def test_valid_rows_are_typed():
+    valid, errors = validate(upload({}, {'Card Name': '  Kuriboh ', 'Price': '0.25'}))
+    assert errors.empty
+    assert valid['Card Name'].tolist() == ['Dark Magician', 'Kuriboh']
+    assert str(valid['ATK'].dtype) == 'Int16'
+    assert valid['Price'].dtype == np.float32
+
+
+def test_bad_rows_are_quarantined_with_a_report():
+    valid, errors = validate(upload(
+        {},
+        {'Card Name': 'Kuriboh', 'ATK': 'three hundred'},
+        {'Card Name': 'Blue-Eyes White Dragon', 'Price': -1},
+    ))
+    assert valid['Card Name'].tolist() == ['Dark Magician']
+    assert list(errors.columns) == ERROR_COLUMNS
+    assert errors[['row', 'card', 'column', 'value', 'error']].values.tolist() == [
+        [1, 'Kuriboh', 'ATK', 'three hundred', 'not an integer'],
+        [2, 'Blue-Eyes White Dragon', 'Price', '-1.0', 'below 0'],
+    ]
+
+
+def test_missing_and_whitespace_names_are_quarantined():
+    valid, errors = validate(upload({'Card Name': '   '}, {'Card Name': None}, {}))
+    assert valid['Card Name'].tolist() == ['Dark Magician']
+    assert errors['row'].tolist() == [0, 1]
+    assert set(errors['error']) == {'missing value'}
+
+
+def test_blank_optional_text_becomes_the_placeholder():
+    valid, _ = validate(upload({'Set': ' ', 'Rarity': None}))
+    assert valid.loc[0, 'Set'] == MISSING_VALUE
+    assert valid.loc[0, 'Rarity'] == MISSING_VALUE
+
+
+def test_spells_and_traps_have_monster_fields_blanked():
+    valid, errors = validate(upload(
+        {'Card Name': 'Pot of Greed', 'Type': 'Spells', 'Level': 'n/a', 'ATK': '-', 'Archetype': 'Pot'},
+        {'Card Name': 'Mirror Force', 'Type': 'Traps'},
+    ))
+    assert errors.empty
+    assert valid['Level'].isna().all() and valid['ATK'].isna().all() and valid['DEF'].isna().all()
+    assert valid['Archetype'].tolist() == [MISSING_VALUE, MISSING_VALUE]
+
+
+def test_fractional_and_overflowing_integers_are_rejected():
+    valid, errors = validate(upload({'Inventory Count': 2.5}, {'ATK': 40000}, {'Level': 300}))
+    assert valid.empty
+    # One report per schema column, in schema order
+    assert errors.sort_values('row')[['row', 'column', 'error']].values.tolist() == [
+        [0, 'Inventory Count', 'not a whole number'],
+        [1, 'ATK', 'above 32767'],
+        [2, 'Level', 'above 127'],
+    ]
+
+
+def test_missing_columns_reject_the_upload():
+    valid, errors = validate(upload({}).drop(columns=['Price', 'Rarity']))
+    assert valid.empty
+    assert sorted(errors['column']) == ['Price', 'Rarity']
+    assert set(errors['error']) == {'missing column'}
@@ -0,0 +1,113 @@
+import sqlite3
+import pandas as pd
+import pytest
+from database import Database
+
+
+def cards(*rows, **columns) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'Card Name': name, 'Set': 'LOB', 'Rarity': 'Common', 'Condition': 'Near Mint',
+         'Price': price, 'Inventory Count': count, **columns}
+        for name, price, count in rows
+    ])
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cards.db')
+
+
+@pytest.fixture
+def database(path):
+    database = Database(path)
+    yield database
+    database.close()
+
+
+def stored(database) -> dict:
+    data = database.retrieve_data_from_db()
+    return {name: (float(price), int(count))
+            for name, price, count in zip(data['Card Name'], data['Price'], data['Inventory Count'], strict=True)}
+
+
+def test_merge_counts_inserted_updated_and_unchanged(database):
+    counts = database.load_data_to_db(cards(('Dark Magician', 12.5, 2), ('Kuriboh', 0.25, 7)))
+    assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+    counts = database.load_data_to_db(cards(('Dark Magician', 12.5, 2), ('Kuriboh', 0.5, 7), ('Sangan', 1.0, 1)))
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+    assert stored(database) == {'Dark Magician': (12.5, 2), 'Kuriboh': (0.5, 7), 'Sangan': (1.0, 1)}
+
+
+def test_merge_keeps_ids_and_rows_missing_from_the_upload(database):
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 2), ('Kuriboh', 0.25, 7)))
+    ids = database.retrieve_data_from_db().set_index('Card Name')['id'].to_dict()
+    database.load_data_to_db(cards(('Kuriboh', 0.5, 6)))
+    assert database.retrieve_data_from_db().set_index('Card Name')['id'].to_dict() == ids
+
+
+def test_last_row_wins_for_an_identity_repeated_in_one_upload(database):
+    counts = database.load_data_to_db(cards(('Dark Magician', 10.0, 1), ('Kuriboh', 0.25, 7),
+                                            ('Dark Magician', 12.5, 3)))
+    assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+    assert stored(database)['Dark Magician'] == (12.5, 3)
+
+
+def test_replace_empties_the_table_but_keeps_the_schema(database):
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 2), ('Kuriboh', 0.25, 7)))
+    counts = database.load_data_to_db(cards(('Sangan', 1.0, 1)), mode='replace')
+    assert counts == {'inserted': 1, 'updated': 0, 'unchanged': 0}
+    assert stored(database) == {'Sangan': (1.0, 1)}
+    with database.pool.connection() as conn:
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list('cards')")}
+        column_types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info('cards')")}
+    assert 'idx_cards_identity' in indexes
+    assert column_types['id'] == 'INTEGER' and column_types['Price'] == 'REAL'
+
+
+def test_missing_identity_values_get_the_placeholder(database):
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 2), Set=None))
+    assert database.retrieve_data_from_db().loc[0, 'Set'] == 'Not specified'
+
+
+def test_upload_without_identity_columns_is_rejected(database):
+    with pytest.raises(ValueError):
+        database.load_data_to_db(pd.DataFrame({'Card Name': ['Dark Magician'], 'Price': [1.0]}))
+    with pytest.raises(ValueError):
+        database.load_data_to_db(cards(('Dark Magician', 12.5, 2)), mode='append')
+
+
+def test_legacy_table_is_migrated_into_the_typed_schema(path):
+    conn = sqlite3.connect(path)
+    # The old loader replaced the whole table with DataFrame.to_sql, index column and all
+    pd.concat([
+        cards(('Dark Magician', 10.0, 1), ('Kuriboh', 0.25, 7), ('Dark Magician', 12.5, 3)),
+        pd.DataFrame({'Card Name': [None], 'Set': ['LOB']}),
+    ]).to_sql('cards', conn, index=True)
+    conn.close()
+
+    database = Database(path)
+    try:
+        assert stored(database) == {'Dark Magician': (12.5, 3), 'Kuriboh': (0.25, 7)}
+        with database.pool.connection() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'cards_legacy' not in tables
+        assert database.retrieve_data_from_db()['id'].tolist() == [1, 2]
+    finally:
+        database.close()
+
+
+def test_read_paths_share_the_card_dtypes(database):
+    database.load_data_to_db(cards(('Dark Magician', 0.1, 2), ('Kuriboh', 0.25, 7)))
+    expected = database.retrieve_data_from_db().dtypes
+    frames = [
+        database.query_cards(),
+        database.top_value_cards(),
+        database.price_delta('2000-01-01'),
+        database.changed_cards('ebay')[0],
+        database.collection_summary('Set'),
+    ]
+    for frame in frames:
+        shared = [column for column in frame.columns if column in expected.index and column != 'id']
+        assert shared
+        assert frame.dtypes[shared].to_dict() == expected[shared].to_dict()
@@ -0,0 +1,73 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from deduplicator import CardDeduplicator, normalize_sets
+
+
+def duplicates(*rows, set_names=None) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Card Name': [name for name, _, _ in rows],
+        'Set': set_names or ['Legend of Blue Eyes'] * len(rows),
+        'Rarity': 'Ultra Rare',
+        'Condition': 'Near Mint',
+        'Price': [price for _, price, _ in rows],
+        'Inventory Count': [count for _, _, count in rows],
+    })
+
+
+SPELLINGS = duplicates(('Dark Magician', 10.0, 1), ('dark magician', 12.0, 2), ('Dark  Magician', np.nan, 3))
+
+
+@pytest.mark.parametrize('rule, price', [
+    ('max', 12.0),
+    ('min', 10.0),
+    ('mean', 11.0),
+    ('weighted', 11.33),
+    ('first', 10.0),
+    ('last', 12.0),
+])
+def test_price_rules(rule, price):
+    consolidated, report = CardDeduplicator(rule).consolidate(SPELLINGS)
+    assert len(consolidated) == 1
+    assert consolidated.loc[0, 'Card Name'] == 'Dark Magician'
+    assert consolidated.loc[0, 'Inventory Count'] == 6
+    assert consolidated.loc[0, 'Price'] == pytest.approx(price, abs=1e-4)
+    assert report.loc[0, 'rows'] == 3
+
+
+def test_weighted_price_falls_back_to_mean_without_inventory():
+    data = duplicates(('Dark Magician', 10.0, 0), ('dark magician', 13.0, None))
+    consolidated, _ = CardDeduplicator('weighted').consolidate(data)
+    assert consolidated.loc[0, 'Price'] == pytest.approx(11.5)
+
+
+def test_unknown_price_rule():
+    with pytest.raises(ValueError):
+        CardDeduplicator('median')
+
+
+def test_sets_reduce_to_their_code():
+    sets = pd.Series(['Legend of Blue Eyes', 'Legend of Blue Eyes (LOB-EN)', 'LOB-EN001', 'Metal Raiders'])
+    assert normalize_sets(sets).tolist() == ['lob', 'lob', 'lob', 'metal raiders']
+
+
+def test_set_name_with_several_codes_is_left_alone():
+    sets = pd.Series(['Starter Deck', 'Starter Deck (SDY-EN)', 'Starter Deck (SDK-EN)'])
+    assert normalize_sets(sets).tolist() == ['starter deck', 'sdy', 'sdk']
+
+
+def test_sets_without_codes_do_not_warn():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert normalize_sets(pd.Series(['Metal Raiders', 'Pharaoh’s Servant'])).tolist() == [
+            'metal raiders', 'pharaohs servant'
+        ]
+
+
+def test_coded_and_uncoded_set_spellings_merge():
+    data = duplicates(('Dark Magician', 10.0, 1), ('Dark Magician', 12.0, 1),
+                      set_names=['Legend of Blue Eyes', 'Legend of Blue Eyes (LOB-EN)'])
+    consolidated, _ = CardDeduplicator().consolidate(data)
+    assert consolidated['Set'].tolist() == ['Legend of Blue Eyes']
+    assert consolidated.loc[0, 'Inventory Count'] == 2
@@ -0,0 +1,27 @@
+import io
+import pandas as pd
+import export_collection
+from database import Database
+
+
+def test_full_export_streams_listings_from_the_database(tmp_path):
+    path = str(tmp_path / 'cards.db')
+    database = Database(path)
+    database.load_data_to_db(pd.DataFrame({
+        'Card Name': ['Dark Magician', 'Kuriboh'],
+        'Set': 'LOB',
+        'Rarity': 'Common',
+        'Condition': 'Near Mint',
+        'Price': [12.5, 0.25],
+        'Inventory Count': [2, 7],
+    }))
+    database.close()
+
+    buffer = io.BytesIO()
+    export_collection.export_to_excel(export_path=buffer, database_path=path)
+    listings = pd.read_excel(io.BytesIO(buffer.getvalue()))
+
+    _, template_columns = export_collection.load_template()
+    assert list(listings.columns) == list(template_columns)
+    assert listings['CustomLabel'].tolist() == ['VC-1', 'VC-2']
+    assert listings['C:Card Name'].tolist() == ['Dark Magician', 'Kuriboh']
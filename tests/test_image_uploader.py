@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+import image_uploader
+from database import Database
+from image_uploader import BulkImageUploader, LocalObjectStore
+
+
+class FlakyStore(LocalObjectStore):
+    """Fails the first `failures` uploads, as a bucket returning transient errors would."""
+
+    def __init__(self, root, failures=0):
+        super().__init__(root)
+        self.failures = failures
+        self.uploads = 0
+
+    def upload_file(self, path, name):
+        self.uploads += 1
+        if self.uploads <= self.failures:
+            raise ConnectionError('service unavailable')
+        super().upload_file(path, name)
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'cards.db'))
+    database.load_data_to_db(pd.DataFrame({
+        'Card Name': ['Dark Magician', 'Dark Magician', 'Blue-Eyes White Dragon'],
+        'Set': ['LOB', 'SDY', 'LOB'],
+        'Rarity': 'Ultra Rare',
+        'Condition': 'Near Mint',
+        'Inventory Count': 1,
+    }))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    slept = []
+    monkeypatch.setattr(image_uploader.time, 'sleep', slept.append)
+    return slept
+
+
+def scan(tmp_path, name, content=b'scan'):
+    path = tmp_path / 'scans' / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+def image_urls(database) -> dict:
+    cards = database.retrieve_data_from_db()
+    return dict(zip(cards['Card Name'] + ' / ' + cards['Set'].astype(str), cards['Image URL'], strict=True))
+
+
+def test_urls_are_written_back_in_one_transaction(tmp_path, database, monkeypatch):
+    uploader = BulkImageUploader(LocalObjectStore(str(tmp_path / 'store')))
+    images = {
+        'Dark Magician': scan(tmp_path, 'Dark Magician.png', b'dm'),
+        'Blue-Eyes White Dragon': scan(tmp_path, 'Blue-Eyes White Dragon.jpg', b'bewd'),
+    }
+    jobs = []
+    submit = database.writer.submit
+    monkeypatch.setattr(database.writer, 'submit', lambda job, *args: jobs.append(job) or submit(job, *args))
+
+    result = uploader.upload_for_cards(images, database)
+
+    assert (result['uploaded'], result['skipped'], result['failed']) == (2, 0, {})
+    assert result['cards_updated'] == 3
+    assert len(jobs) == 1
+    urls = image_urls(database)
+    assert urls['Dark Magician / LOB'] == urls['Dark Magician / SDY'] == result['urls'][images['Dark Magician']]
+    assert urls['Blue-Eyes White Dragon / LOB'].endswith('.jpg')
+
+
+def test_content_already_stored_is_skipped(tmp_path, database):
+    store = FlakyStore(str(tmp_path / 'store'))
+    uploader = BulkImageUploader(store)
+    first = uploader.upload_for_cards({'Dark Magician': scan(tmp_path, 'Dark Magician.png')}, database)
+    # Same bytes under another name hash to the same object
+    second = uploader.upload_for_cards({'Blue-Eyes White Dragon': scan(tmp_path, 'copy.png')}, database)
+
+    assert (first['uploaded'], first['skipped']) == (1, 0)
+    assert (second['uploaded'], second['skipped']) == (0, 1)
+    assert store.uploads == 1
+    urls = image_urls(database)
+    assert urls['Blue-Eyes White Dragon / LOB'] == urls['Dark Magician / LOB']
+
+
+def test_transient_errors_are_retried_with_backoff(tmp_path, database, delays):
+    store = FlakyStore(str(tmp_path / 'store'), failures=2)
+    uploader = BulkImageUploader(store, max_attempts=4, backoff=0.5)
+    result = uploader.upload_for_cards({'Dark Magician': scan(tmp_path, 'Dark Magician.png')}, database)
+
+    assert (result['uploaded'], result['failed']) == (1, {})
+    assert store.uploads == 3
+    assert delays == [0.5, 1.0]
+
+
+def test_exhausted_retries_are_reported_and_not_written(tmp_path, database, delays):
+    store = FlakyStore(str(tmp_path / 'store'), failures=10)
+    uploader = BulkImageUploader(store, max_attempts=3, backoff=0.5)
+    path = scan(tmp_path, 'Dark Magician.png')
+    result = uploader.upload_for_cards({'Dark Magician': path}, database)
+
+    assert result['failed'] == {path: 'service unavailable'}
+    assert result['cards_updated'] == 0
+    assert delays == [0.5, 1.0]
+    assert image_urls(database)['Dark Magician / LOB'] is None
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from database import Database, to_julian_day
+
+
+def cards(*rows) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'Card Name': name, 'Set': 'LOB', 'Rarity': 'Common', 'Condition': 'Near Mint',
+         'Price': price, 'Inventory Count': count}
+        for name, price, count in rows
+    ])
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'cards.db'))
+    yield database
+    database.close()
+
+
+def backdate(database, timestamp):
+    """Move the history rows recorded just now to timestamp."""
+    database.writer.run(lambda conn: conn.execute(
+        "UPDATE price_history SET recorded_at = ? WHERE recorded_at > julianday('now', '-1 hour')",
+        (to_julian_day(timestamp),)
+    ))
+
+
+def history(database) -> list:
+    return database.price_history()[['id', 'Price', 'Inventory Count']].values.tolist()
+
+
+def test_history_records_price_and_inventory_changes_only(database):
+    database.load_data_to_db(cards(('Dark Magician', 10.0, 1)))
+    database.load_data_to_db(cards(('Dark Magician', 10.0, 1)))
+    database.set_image_urls({'Dark Magician': 'https://example.com/dm.png'})
+    assert history(database) == [[1, 10.0, 1]]
+
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 1)))
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 3)))
+    assert history(database) == [[1, 10.0, 1], [1, 12.5, 1], [1, 12.5, 3]]
+
+
+def test_history_time_range_is_inclusive(database):
+    database.load_data_to_db(cards(('Dark Magician', 10.0, 1)))
+    backdate(database, '2024-01-01')
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 1)))
+    backdate(database, '2024-03-01')
+
+    assert database.price_history(start='2024-01-01', end='2024-01-01')['Price'].tolist() == [10.0]
+    assert database.price_history(start='2024-01-02')['Price'].tolist() == [12.5]
+    assert database.price_history(card_ids=[2]).empty
+    recorded = database.price_history()['Recorded At'].tolist()
+    assert recorded == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-03-01')]
+
+
+def test_movement_tracks_the_last_price_change(database):
+    database.load_data_to_db(cards(('Dark Magician', 10.0, 1), ('Kuriboh', 0.25, 7)))
+    assert database.price_movement([1, 2]).empty
+
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 1)))
+    database.load_data_to_db(cards(('Dark Magician', 11.0, 4), ('Kuriboh', 0.25, 6)))
+    movement = database.price_movement([1, 2])
+    assert movement[['id', 'Previous Price']].values.tolist() == [[1, 12.5]]
+
+    database.writer.run(lambda conn: conn.execute('DELETE FROM cards WHERE id = 1'))
+    assert database.price_movement([1]).empty
+
+
+def test_price_delta_compares_with_the_price_as_of_since(database):
+    database.load_data_to_db(cards(('Dark Magician', 10.0, 1)))
+    backdate(database, '2024-01-01')
+    database.load_data_to_db(cards(('Dark Magician', 12.5, 1)))
+    backdate(database, '2024-03-01')
+    database.load_data_to_db(cards(('Kuriboh', 0.5, 1)))
+    backdate(database, '2024-05-01')
+
+    delta = database.price_delta('2024-02-01').set_index('Card Name')
+    assert delta.loc['Dark Magician', 'Price Then'] == 10.0
+    assert delta.loc['Dark Magician', 'Price Change'] == 2.5
+    assert delta.loc['Dark Magician', 'Price Change %'] == pytest.approx(0.25)
+    # Added after since, so there is nothing to compare with
+    assert pd.isna(delta.loc['Kuriboh', 'Price Then']) and pd.isna(delta.loc['Kuriboh', 'Price Change'])
+
+    assert database.price_delta('2024-03-01', card_ids=[1])['Price Change'].tolist() == [0.0]
+    assert database.price_delta('2023-12-31', card_ids=[1])['Price Then'].isna().all()
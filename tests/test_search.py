@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+from database import Database, fts_query
+
+
+def cards(*rows) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'Card Name': name, 'Set': 'LOB', 'Type': card_type, 'Rarity': 'Common', 'Condition': 'Near Mint',
+         'Card Effect': effect, 'Inventory Count': 1}
+        for name, card_type, effect in rows
+    ])
+
+
+COLLECTION = cards(
+    ('Dark Magician', 'Monsters', 'The ultimate wizard in terms of attack and defense.'),
+    ('Dark Magician Girl', 'Monsters', 'Gains 300 ATK for every Dark Magician in the GYs.'),
+    ('Skilled Dark Magician', 'Monsters',
+     'Each time you or your opponent activates a Spell Card, place 1 Spell Counter on this card when '
+     'that Spell resolves. You can Tribute this card with 3 Spell Counters on it; Special Summon 1 '
+     'monster from your hand, Deck or GY.'),
+    ('Dark Magic Attack', 'Spells', 'If you control "Dark Magician": Destroy all Spells and Traps your opponent controls.'),
+    ('Maléfic Stardust Dragon', 'Monsters', 'Cannot be Normal Summoned or Set.'),
+)
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / 'cards.db'))
+    database.load_data_to_db(COLLECTION)
+    yield database
+    database.close()
+
+
+def names(frame) -> list:
+    return frame['Card Name'].tolist()
+
+
+def test_fts_query_matches_every_word_as_a_prefix():
+    assert fts_query('Blue-Eyes  dragon') == '"Blue"* "Eyes"* "dragon"*'
+    assert fts_query('"magician" OR -girl') == '"magician"* "OR"* "girl"*'
+    assert fts_query(' ?! ') == ''
+
+
+def test_search_matches_word_prefixes_anywhere(database):
+    assert set(names(database.search('dark magi'))) == {
+        'Dark Magician', 'Dark Magician Girl', 'Skilled Dark Magician', 'Dark Magic Attack'
+    }
+    assert names(database.search('ultimate wiz')) == ['Dark Magician']
+    assert names(database.search('malefic')) == ['Maléfic Stardust Dragon']
+    assert database.search('?!').empty
+    assert database.count_cards(search='?!') == 0
+
+
+def test_search_ranks_by_relevance(database):
+    ranked = names(database.search('magician'))
+    # Matches in name and effect rank first; a match lost in a long effect ranks last
+    assert set(ranked[:2]) == {'Dark Magician', 'Dark Magician Girl'}
+    assert ranked[-1] == 'Skilled Dark Magician'
+
+
+def test_search_filters_sorts_and_pages(database):
+    assert names(database.search('dark', card_types=['Spells'])) == ['Dark Magic Attack']
+    assert database.count_cards(['Monsters'], search='dark') == 3
+    ordered = database.query_cards(order_by=[('Card Name', True)], search='dark', limit=2, offset=1)
+    assert names(ordered) == ['Dark Magician', 'Dark Magician Girl']
+
+
+def test_index_follows_updates_and_deletes(database):
+    database.writer.run(lambda conn: conn.execute(
+        'UPDATE cards SET "Card Name" = ? WHERE "Card Name" = ?', ('Kuriboh', 'Dark Magician Girl')
+    ))
+    database.writer.run(lambda conn: conn.execute('DELETE FROM cards WHERE "Card Name" = ?', ('Dark Magic Attack',)))
+    assert 'Dark Magician Girl' not in names(database.search('girl'))
+    assert names(database.search('kurib')) == ['Kuriboh']
+    # Kuriboh keeps the old card's effect, which mentions "Dark Magician"
+    assert set(names(database.search('dark'))) == {'Dark Magician', 'Skilled Dark Magician', 'Kuriboh'}
+
+    database.load_data_to_db(cards(('Sangan', 'Monsters', None)), mode='replace')
+    assert database.search('dark').empty
+    assert names(database.search('sang')) == ['Sangan']
+    with database.pool.connection() as conn:
+        # Raises if the index no longer matches the cards table
+        conn.execute("INSERT INTO cards_fts (cards_fts, rank) VALUES ('integrity-check', 1)")
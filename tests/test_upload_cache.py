@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+import upload_cache
+from upload_cache import UploadCache, content_key
+
+COLUMNS = ['Card Name', 'Set']
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return UploadCache(str(tmp_path / 'upload_cache.db'))
+
+
+def test_round_trip(cache):
+    frame = pd.DataFrame({'Card Name': ['Dark Magician'], 'Set': ['LOB']})
+    errors = pd.DataFrame({'row': [], 'error': []})
+    cache.put('key', frame, errors)
+    cached_frame, cached_errors = cache.get('key')
+    pd.testing.assert_frame_equal(cached_frame, frame)
+    assert cached_errors.empty
+
+
+def test_unreadable_entry_is_a_miss_and_is_dropped(cache):
+    with cache.conn:
+        cache.conn.execute(
+            "INSERT INTO upload_cache (key, frame, size, rows, last_used) VALUES ('key', x'00ff', 2, 1, 0)"
+        )
+    assert cache.get('key') is None
+    assert cache.conn.execute('SELECT COUNT(*) FROM upload_cache').fetchone()[0] == 0
+
+
+def test_key_covers_content_columns_and_pandas_version(monkeypatch):
+    key = content_key(b'workbook', COLUMNS)
+    assert key == content_key(b'workbook', COLUMNS)
+    assert key != content_key(b'workbook!', COLUMNS)
+    assert key != content_key(b'workbook', COLUMNS[:1])
+    monkeypatch.setattr(upload_cache.pd, '__version__', '0.0.0')
+    assert key != content_key(b'workbook', COLUMNS)
@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from utils import log_debug
+
+THUMBNAIL_DIR = '.thumbnails'
+
+# Bounding box for gallery thumbnails; card scans keep their aspect ratio
+THUMBNAIL_SIZE = (240, 350)
+
+THUMBNAIL_QUALITY = 80
+
+# Total size of cached thumbnails before the least recently used are evicted
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# Parallel downloads when filling the cache for a gallery page
+FETCH_WORKERS = 8
+
+FETCH_TIMEOUT = 10
+
+
+def make_thumbnail(source) -> bytes:
+    """Downscale an image (path or file object) to a JPEG thumbnail."""
+    # Pillow is only needed on a cache miss
+    from PIL import Image
+    with Image.open(source) as image:
+        image.draft('RGB', THUMBNAIL_SIZE)
+        image = image.convert('RGB')
+        image.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        image.save(out, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+        return out.getvalue()
+
+
+class ThumbnailCache:
+    """Size-bounded on-disk thumbnail cache keyed by a hash of the full image URL."""
+
+    def __init__(self, root: str = THUMBNAIL_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._total = sum(entry.stat().st_size for entry in os.scandir(root) if entry.is_file())
+
+    def path_for(self, url: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(url.encode()).hexdigest() + '.jpg')
+
+    def _store(self, url: str, thumbnail: bytes) -> str:
+        path = self.path_for(url)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(thumbnail)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total += len(thumbnail) - replaced
+            if self._total > self.max_bytes:
+                self._evict()
+        return path
+
+    def _evict(self):
+        """Remove least recently used thumbnails until the cache fits in max_bytes."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.root) if entry.name.endswith('.jpg')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._total <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            os.remove(entry.path)
+            self._total -= size
+
+    def put_file(self, url: str, path: str) -> str:
+        """Generate the thumbnail for an image being uploaded to url from its local file."""
+        return self._store(url, make_thumbnail(path))
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the local thumbnail for url, downloading the full image once on a miss."""
+        path = self.path_for(url)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        try:
+            with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+                return self._store(url, make_thumbnail(io.BytesIO(response.read())))
+        except Exception as e:
+            log_debug("Could not build thumbnail for %s: %s", url, e)
+            return None
+
+    def get_many(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """Resolve thumbnails for a page of images, fetching misses in parallel."""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            return dict(zip(urls, pool.map(self.get, urls), strict=True))
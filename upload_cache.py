@@ -0,0 +1,91 @@
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple, Union
+import pandas as pd
+from utils import log_debug
+
+CACHE_PATH = 'upload_cache.db'
+
+# Total size of cached frames before least recently used entries are evicted
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Bump when loading or validation changes so stale frames are not reused; the pandas
+# version is part of every key as well, since pickled frames do not survive upgrades
+CACHE_VERSION = 3
+
+
+def content_key(source: Union[bytes, str], required_columns: List[str]) -> str:
+    """Hash file content (bytes or a path) together with the required columns."""
+    digest = hashlib.sha256(f'v{CACHE_VERSION}\0pandas {pd.__version__}\0'.encode())
+    digest.update('\0'.join(required_columns).encode())
+    digest.update(b'\0')
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    """Validated workbook frames and their error reports, keyed by a hash of the file bytes and required columns."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS upload_cache (
+                key TEXT PRIMARY KEY,
+                frame BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_upload_cache_last_used ON upload_cache (last_used)')
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        with self._lock, self.conn:
+            row = self.conn.execute('SELECT frame FROM upload_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE upload_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+        try:
+            return pickle.loads(zlib.decompress(row[0]))
+        except Exception as e:
+            # A corrupt or unreadable entry is a miss; drop it so the file is parsed afresh
+            log_debug("Discarding unreadable upload cache entry %s: %s", key, e)
+            with self._lock, self.conn:
+                self.conn.execute('DELETE FROM upload_cache WHERE key = ?', (key,))
+            return None
+
+    def put(self, key: str, frame: pd.DataFrame, errors: pd.DataFrame):
+        blob = zlib.compress(pickle.dumps((frame, errors), protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO upload_cache (key, frame, size, rows, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, blob, len(blob), len(frame), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM upload_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute('SELECT key, size FROM upload_cache ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute('DELETE FROM upload_cache WHERE key = ?', (key,))
+            total -= size
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM upload_cache')
@@ -1,39 +1,86 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Union
 import pandas as pd
-from typing import Union, List
-
-DEBUG = True  # Debug flag to control logging
-
-def log_debug(message: Union[str, pd.DataFrame, pd.Series]):
-    if DEBUG:
-        print(message)  # Use print for debugging in utility functions
-
-def prepare_data(data: pd.DataFrame) -> pd.DataFrame:
-    # Ensure columns are of string type for filtering
-    for col in ['Card Name', 'Set']:
-        if col in data.columns:
-            data[col] = data[col].astype(str)
-
-    # Drop rows with missing 'Card Name'
-    data = data.dropna(subset=['Card Name'])
-
-    # Handle Spells and Traps to not require archetype, level, or attribute
-    data.loc[data['Type'].isin(['Spells', 'Traps']), ['Archetype', 'Level', 'Attribute']] = 'Not specified'
-
-    return data
-
-def validate_columns(data: pd.DataFrame, required_columns: List[str]) -> bool:
-    missing_columns = [col for col in required_columns if col not in data.columns]
-    if missing_columns:
-        log_debug(f"Missing required columns: {', '.join(missing_columns)}")
-        return False
-    return True
-
-def validate_data_types(data: pd.DataFrame) -> bool:
-    for column in ['Price', 'Inventory Count']:
-        if column in data.columns:
-            try:
-                data[column] = pd.to_numeric(data[column], errors='raise')
-            except ValueError as e:
-                log_debug(f"Data type error in column '{column}': {e}")
-                return False
-    return True
\ No newline at end of file
+
+# Logging is configured from the environment:
+#   VIRTUALCARD_LOG_LEVEL       DEBUG, INFO, WARNING (default), ...
+#   VIRTUALCARD_LOG_DATAFRAMES  1 to include DataFrame dumps in debug logs
+#   VIRTUALCARD_LOG_JSON        path of a JSON lines file receiving all records
+LOG_LEVEL = os.environ.get('VIRTUALCARD_LOG_LEVEL', 'WARNING').upper()
+LOG_DATAFRAMES = os.environ.get('VIRTUALCARD_LOG_DATAFRAMES') == '1'
+LOG_JSON_PATH = os.environ.get('VIRTUALCARD_LOG_JSON')
+
+logger = logging.getLogger('virtualcard')
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, including fields passed through extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = None, json_path: str = None, log_dataframes: bool = None):
+    """(Re)configure the application logger; unspecified settings keep their current value."""
+    global LOG_DATAFRAMES
+    if log_dataframes is not None:
+        LOG_DATAFRAMES = log_dataframes
+    logger.setLevel(level or LOG_LEVEL)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    logger.addHandler(console)
+    if json_path or LOG_JSON_PATH:
+        json_handler = logging.FileHandler(json_path or LOG_JSON_PATH)
+        json_handler.setFormatter(JsonLinesFormatter())
+        logger.addHandler(json_handler)
+
+
+def log_debug(message: Union[str, pd.DataFrame, pd.Series], *args):
+    """Log at debug level, formatting %-style args only when debug logging is enabled.
+
+    DataFrames and Series are skipped unless DataFrame dumps are turned on.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if isinstance(message, (pd.DataFrame, pd.Series)):
+        if LOG_DATAFRAMES:
+            logger.debug('%s', message)
+        return
+    logger.debug(message, *args)
+
+
+@contextmanager
+def log_span(stage: str, **fields):
+    """Time a pipeline stage (load, validate, persist, filter, render, ...) and log its duration.
+
+    Yields a dict that the block can add fields to, such as row counts.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        logger.info('%s took %.1f ms', stage, duration_ms, extra={'stage': stage, 'duration_ms': duration_ms, **fields})
+
+
+configure_logging()